@@ -0,0 +1,151 @@
+import argparse
+import multiprocessing
+import sys
+import time
+import minimax as mm
+from bitboard import mirror
+from common import COLUMN_COUNT
+
+
+def mirror_moves(moves):
+    """
+    :param moves: string of columns numbered from 1
+    :return: the moves reaching the mirror image of the position
+    """
+    return "".join(str(COLUMN_COUNT + 1 - int(c)) for c in moves)
+
+
+def orient(move_strings):
+    """
+    A position and its mirror image have the same score and mirrored best moves, so either can be
+    solved. The orientation is chosen once per line of play: the longest string picks the one with
+    the smallest key, and every string sharing a prefix with it keeps that orientation, so the
+    positions of a game all stay on the same side and share transposition table entries.
+
+    :param move_strings: positions as strings of columns numbered from 1
+    :return: dict move string -> moves of the orientation to solve
+    """
+    prefixes = set()
+    oriented = {}
+    for moves in sorted(set(move_strings), key=len, reverse=True):
+        mirrored = mirror_moves(moves)
+        chosen = None
+        # The longest prefix already oriented decides, symmetric prefixes say nothing
+        for ply in range(len(moves), 0, -1):
+            if moves[:ply] == mirrored[:ply]:
+                break
+            if moves[:ply] in prefixes:
+                chosen = moves
+                break
+            if mirrored[:ply] in prefixes:
+                chosen = mirrored
+                break
+        if chosen is None:
+            key = mm.BoardMinimax.from_moves(moves).key()
+            chosen = mirrored if mirror(key) < key else moves
+        prefixes.update(chosen[:ply] for ply in range(len(chosen) + 1))
+        oriented[moves] = chosen
+    return oriented
+
+
+def plan(move_strings):
+    """
+    Removes duplicate and mirrored positions and orders the rest so that positions sharing moves
+    are solved one after the other, longest first: the transposition table entries left by a deep
+    position are then hit by the searches of its predecessors.
+
+    :param move_strings: positions as strings of columns numbered from 1
+    :return: (moves to solve in order, for each input the index of its position in that list and
+              whether it is mirrored)
+    """
+    oriented = orient(move_strings)
+    positions = {}  # key of the position or of its mirror, the smallest -> (index, key solved)
+    unique = []
+    links = []
+    for moves in move_strings:
+        key = mm.BoardMinimax.from_moves(moves).key()
+        canonical = min(key, mirror(key))
+        if canonical not in positions:
+            solved = oriented[moves]
+            positions[canonical] = (len(unique), key if solved == moves else mirror(key))
+            unique.append(solved)
+        index, solved_key = positions[canonical]
+        links.append((index, solved_key != key))
+    order = sorted(range(len(unique)), key=lambda i: unique[i], reverse=True)
+    rank = {index: position for position, index in enumerate(order)}
+    return [unique[i] for i in order], [(rank[index], mirrored) for index, mirrored in links]
+
+
+def solve_chunk(task):
+    """
+    Solves positions one after the other with the transposition table of the process, run in the
+    worker processes.
+
+    :param task: (list of move strings, depth)
+    :return: list of (best column, score)
+    """
+    chunk, depth = task
+    results = []
+    for moves in chunk:
+        results.append(mm.solve_next(mm.BoardMinimax.from_moves(moves), depth))
+    return results
+
+
+def evaluate(move_strings, depth=10000, workers=1, chunks_per_worker=4):
+    """
+    Solves a batch of positions.
+
+    :param move_strings: positions as strings of columns numbered from 1, like the Test_* files
+    :param depth: depth given to solve, the default solves the positions exactly
+    :param workers: number of processes, 1 solves in this process
+    :param chunks_per_worker: the ordered positions are cut in workers * chunks_per_worker chunks,
+                              each solved by one process with its own transposition table
+    :return: list of (best column numbered from 0, score), in the order of move_strings
+    """
+    to_solve, links = plan(move_strings)
+    if workers <= 1 or len(to_solve) <= 1:
+        results = solve_chunk((to_solve, depth))
+    else:
+        size = max(1, -(-len(to_solve) // (workers * chunks_per_worker)))
+        tasks = [(to_solve[i:i + size], depth) for i in range(0, len(to_solve), size)]
+        with multiprocessing.Pool(workers) as pool:
+            results = [result for chunk in pool.imap(solve_chunk, tasks) for result in chunk]
+    evaluations = []
+    for index, mirrored in links:
+        col, score = results[index]
+        if mirrored and col is not None:
+            col = COLUMN_COUNT - 1 - col
+        evaluations.append((col, score))
+    return evaluations
+
+
+def game_positions(moves):
+    """
+    :param moves: a game as a string of columns numbered from 1
+    :return: the move strings of every position of the game before its last move
+    """
+    return [moves[:ply] for ply in range(len(moves))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Solve a batch of positions given as move strings")
+    parser.add_argument("file", help="One move string per line, anything after it on the line is ignored")
+    parser.add_argument("--depth", "-d", type=int, default=10000)
+    parser.add_argument("--workers", "-j", type=int, default=1)
+    parser.add_argument("--games", action="store_true", help="Evaluate every position of each game of the file")
+    args = parser.parse_args()
+
+    with open(args.file, "r") as f:
+        move_strings = [line.split()[0] for line in f if line.strip()]
+    if args.games:
+        move_strings = [position for moves in move_strings for position in game_positions(moves)]
+    start = time.perf_counter()
+    evaluations = evaluate(move_strings, args.depth, args.workers)
+    elapsed = time.perf_counter() - start
+    for moves, (col, score) in zip(move_strings, evaluations):
+        print(f"{moves or '-'} {score} {'-' if col is None else col + 1}")
+    print(f"{len(move_strings)} positions in {elapsed:.2f} s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import argparse
+import itertools
+import subprocess
+import sys
+import endgame
+import minimax as mm
+import profiling
+
+
+def run_suite(path, limit, depth=10000, skip=0):
+    """
+    Solves the first positions of a Test_* file, starting each one from empty tables.
+
+    :param path: Test_* file, one "moves score" pair per line
+    :param limit: maximum number of positions to solve
+    :param skip: positions skipped at the start of the file
+    :param depth: depth given to solve
+    :return: (positions solved, wrong scores, total nodes, total time)
+    """
+    positions = wrong = nodes = 0
+    elapsed = 0.0
+    with open(path, "r") as f:
+        for line in itertools.islice(f, skip, None):
+            if positions >= limit:
+                break
+            moves, expected = line.split(" ")
+            _, score, solve_nodes, solve_ms = mm.solve_fresh(mm.BoardMinimax.from_moves(moves), depth)
+            elapsed += solve_ms / 1000
+            nodes += solve_nodes
+            positions += 1
+            if score != int(expected):
+                wrong += 1
+    return positions, wrong, nodes, elapsed
+
+
+# Modules that headless tools import, none of them may pull in pygame
+HEADLESS_MODULES = ["bitboard", "minimax", "mcts", "bot", "connect4game", "endgame"]
+
+
+def measure_import(module):
+    """
+    Imports a module in a fresh interpreter.
+
+    :param module: name of the module
+    :return: (cumulative import time in ms, whether pygame got imported)
+    """
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import sys, {module}; print('pygame' in sys.modules)"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    for line in out.stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            cumulative = int(fields[1]) / 1000
+    return cumulative, out.stdout.strip() == "True"
+
+
+def check_imports(budget):
+    """
+    Prints the import time of the headless modules.
+
+    :param budget: maximum cumulative import time in ms
+    :return: True if every module stays under budget without importing pygame
+    """
+    ok = True
+    print(f"{'module':<16}{'import (ms)':>12}{'pygame':>8}")
+    for module in HEADLESS_MODULES:
+        cumulative, pygame = measure_import(module)
+        print(f"{module:<16}{cumulative:>12.1f}{str(pygame):>8}")
+        ok = ok and cumulative <= budget and not pygame
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the minimax solver on Test_* suites")
+    parser.add_argument("suites", nargs="*", default=["Test_L2_R1", "Test_L2_R2"])
+    parser.add_argument("--limit", "-n", type=int, default=20, help="Positions solved per suite")
+    parser.add_argument(
+        "--ordering",
+        choices=("center", "threats", "killers", "history", "all"),
+        default="threats",
+        help="Move ordering used by negamax",
+    )
+    parser.add_argument(
+        "--skip",
+        type=int,
+        default=0,
+        help="Positions skipped at the start of each suite, to benchmark an endgame database on positions it was "
+        "not generated from",
+    )
+    parser.add_argument(
+        "--endgame",
+        metavar="DB",
+        default=None,
+        help="Endgame database probed by negamax, positions it was generated from are answered without search",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="FOLDED_FILE",
+        help="Time the hot paths and print a summary at exit, optionally writing folded stacks for flamegraph.pl",
+    )
+    parser.add_argument(
+        "--import-budget",
+        type=float,
+        default=None,
+        metavar="MS",
+        help="Only check that the headless modules import under MS milliseconds without pygame",
+    )
+    args = parser.parse_args()
+    if args.import_budget is not None:
+        sys.exit(0 if check_imports(args.import_budget) else 1)
+    if args.profile is not None:
+        profiling.enable(args.profile or None)
+    else:
+        profiling.enable_from_env()
+
+    if args.ordering == "center":
+        mm.MOVE_ORDERING = None
+    else:
+        mm.MOVE_ORDERING = mm.MoveOrdering(
+            killers=args.ordering in ("killers", "all"),
+            history=args.ordering in ("history", "all"),
+        )
+
+    if args.endgame:
+        endgame.load(args.endgame)
+
+    print(f"{'suite':<12}{'positions':>10}{'wrong':>7}{'nodes':>12}{'nodes/pos':>11}{'time (s)':>10}")
+    for suite in args.suites:
+        positions, wrong, nodes, elapsed = run_suite(suite, args.limit, skip=args.skip)
+        print(
+            f"{suite:<12}{positions:>10}{wrong:>7}{nodes:>12}"
+            f"{nodes // max(positions, 1):>11}{elapsed:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
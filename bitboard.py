@@ -0,0 +1,124 @@
+from common import ROW_COUNT, COLUMN_COUNT
+
+# Bit col * (ROW_COUNT + 1) + row is the cell (col, row), the extra bit on top of each column stays empty
+PRECOMPUTED_TOP_MASKS = [(1 << (ROW_COUNT - 1)) << col * (ROW_COUNT + 1) for col in range(COLUMN_COUNT)]
+BOTTOM_MASK_COL = [1 << col * (ROW_COUNT + 1) for col in range(COLUMN_COUNT)]
+COLUMN_MASK = [((1 << ROW_COUNT) - 1) << col * (ROW_COUNT + 1) for col in range(COLUMN_COUNT)]
+
+
+def bottom(width, height):
+    if width == 0:
+        return 0
+    return bottom(width - 1, height) | 1 << (width - 1) * (height + 1)
+
+
+BOTTOM_MASK = bottom(COLUMN_COUNT, ROW_COUNT)
+BOARD_MASK = BOTTOM_MASK * ((1 << ROW_COUNT) - 1)
+
+
+def compute_winning_position(position, mask):
+    # vertical
+    r = (position << 1) & (position << 2) & (position << 3)
+
+    # horizontal
+    p = (position << (ROW_COUNT + 1)) & (position << 2 * (ROW_COUNT + 1))
+    r |= p & (position << 3 * (ROW_COUNT + 1))
+    r |= p & (position >> (ROW_COUNT + 1))
+    p >>= 3 * (ROW_COUNT + 1)
+    r |= p & (position << (ROW_COUNT + 1))
+    r |= p & (position >> 3 * (ROW_COUNT + 1))
+
+    # diagonal 1
+    p = (position << ROW_COUNT) & (position << 2 * ROW_COUNT)
+    r |= p & (position << 3 * ROW_COUNT)
+    r |= p & (position >> ROW_COUNT)
+    p >>= 3 * ROW_COUNT
+    r |= p & (position << ROW_COUNT)
+    r |= p & (position >> 3 * ROW_COUNT)
+
+    # diagonal 2
+    p = (position << (ROW_COUNT + 2)) & (position << 2 * (ROW_COUNT + 2))
+    r |= p & (position << 3 * (ROW_COUNT + 2))
+    r |= p & (position >> (ROW_COUNT + 2))
+    p >>= 3 * (ROW_COUNT + 2)
+    r |= p & (position << (ROW_COUNT + 2))
+    r |= p & (position >> 3 * (ROW_COUNT + 2))
+
+    return r & (BOARD_MASK ^ mask)
+
+
+def alignment(pos):
+    # Horizontal check
+    m = pos & (pos >> (ROW_COUNT + 1))
+    if m & (m >> (2 * (ROW_COUNT + 1))):
+        return True
+
+    # Diagonal check (bottom-left to top-right)
+    m = pos & (pos >> ROW_COUNT)
+    if m & (m >> (2 * ROW_COUNT)):
+        return True
+
+    # Diagonal check (top-left to bottom-right)
+    m = pos & (pos >> (ROW_COUNT + 2))
+    if m & (m >> (2 * (ROW_COUNT + 2))):
+        return True
+
+    # Vertical check
+    m = pos & (pos >> 1)
+    if m & (m >> 2):
+        return True
+
+    return False
+
+
+def from_grid(board):
+    """
+    Converts a Connect4Game board (board[col][row] holding 1, -1 or 0) to bitboards.
+
+    :param board: the game board
+    :return: ({1: stones of player 1, -1: stones of player -1}, mask of all stones)
+    """
+    positions = {1: 0, -1: 0}
+    mask = 0
+    for col, column in enumerate(board):
+        for row, cell in enumerate(column):
+            if cell:
+                bit = 1 << (col * (ROW_COUNT + 1) + row)
+                positions[cell] |= bit
+                mask |= bit
+    return positions, mask
+
+
+def winning_drop_spots(board):
+    """
+    Computes for both players the cells where dropping a disc now would align four,
+    without modifying the board.
+
+    :param board: the game board
+    :return: {1: mask of winning drop spots, -1: mask of winning drop spots}
+    """
+    positions, mask = from_grid(board)
+    playable = (mask + BOTTOM_MASK) & BOARD_MASK
+    return {player: compute_winning_position(position, mask) & playable for player, position in positions.items()}
+
+
+def first_column(spots):
+    """
+    :param spots: mask of cells
+    :return: the lowest column holding one of the cells, or None if the mask is empty
+    """
+    if not spots:
+        return None
+    return ((spots & -spots).bit_length() - 1) // (ROW_COUNT + 1)
+
+
+def mirror(bits):
+    """
+    :param bits: bitboard, such as a position, a mask or a key
+    :return: the bitboard flipped left to right
+    """
+    result = 0
+    for col in range(COLUMN_COUNT):
+        column = (bits >> col * (ROW_COUNT + 1)) & ((1 << (ROW_COUNT + 1)) - 1)
+        result |= column << (COLUMN_COUNT - 1 - col) * (ROW_COUNT + 1)
+    return result
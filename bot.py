@@ -1,5 +1,6 @@
 import random
 import math
+import weakref
 from common import (
     ROW_COUNT,
     COLUMN_COUNT,
@@ -9,6 +10,9 @@ from common import (
     RANDOM_IMPR,
     Observer,
 )
+from bitboard import winning_drop_spots, first_column
+import minimax as mm
+from mcts import MCTSTree
 
 YELLOW_PLAYER = 1
 RED_PLAYER = -1
@@ -24,7 +28,7 @@ class Bot(Observer):
     """
 
     def __init__(
-        self, game, bot_type=None, depth=None, iteration=None, pruning=True
+        self, game, bot_type=None, depth=None, iteration=None, pruning=True, progress=None, cancel=None
     ):
         """
         Constructor of the Bot class.
@@ -34,21 +38,28 @@ class Bot(Observer):
         :param depth: depth used in the Minimax algorithm if the Minimax bot is used
         :param iteration: number of iterations used in the MCTS algorithm in case the MCTS bot is used
         :param pruning: boolean used for the pruning in the Minimax algorithm if the Minimax bot is used
+        :param progress: optional callable receiving the common.Progress reports of the MiniMax and MCTS searches
+        :param cancel: optional common.CancelToken stopping the MiniMax and MCTS searches, the bot then plays an
+            immediate win or block if there is one, the best move found so far otherwise. Only the current move
+            is cut short, the token is reset once the move is chosen
         """
         self._game = game
         # Bot type determines how the bot picks his moves
         self._type = bot_type
+        self._progress = progress
+        self._cancel = cancel
         if self._type == MINIMAX:
             self._depth = depth
             self._pruning = pruning
         elif self._type == MONTE_CARLO:
             self._iteration = iteration
+            self._tree = None
 
     def __repr__(self):
         return self._type
 
     def update(self, obj, event, *argv):
-        print(obj)
+        pass
 
     def make_move(self):
         """
@@ -71,12 +82,13 @@ class Bot(Observer):
         # then checks if there is any move that blocks a direct winning move for the opponent.
         # If there is no such move, it picks a valid random move.
         elif self._type == RANDOM_IMPR:
-            win_col = self.get_winning_move()
+            spots = winning_drop_spots(self._game._board)
+            win_col = self.get_winning_move(spots)
             if win_col is not None:
                 # print("Winning column :", win_col)
                 column = win_col
             else:
-                def_move = self.get_defensive_move()
+                def_move = self.get_defensive_move(spots)
                 if def_move is not None:
                     # print("Defensive column :", def_move)
                     column = def_move
@@ -94,33 +106,40 @@ class Bot(Observer):
             )
             # print(column)
         elif self._type == MONTE_CARLO:
-            o = Node(self._game.copy_state())
-            column = self.monte_carlo_tree_search(self._iteration, o, 2.0)
+            board = mm.BoardMinimax(self._game._board, self._game._turn, 0)
+            board.rounds = board.mask.bit_count()
+            if self._tree is None:
+                self._tree = MCTSTree(board.position, board.mask, board.rounds)
+            else:
+                # Keeps the statistics of the subtree reached by the last two moves
+                self._tree.advance(board.position, board.mask, board.rounds)
+            column = self._tree.search(self._iteration, 2.0, self._progress, self._cancel)
         else:
             column = 0
 
+        if self._type in (MINIMAX, MONTE_CARLO) and self._cancel is not None and self._cancel.cancelled:
+            # The search may have been stopped before it even looked at the board
+            spots = winning_drop_spots(self._game._board)
+            for forced in (self.get_winning_move(spots), self.get_defensive_move(spots)):
+                if forced is not None:
+                    column = forced
+                    break
+            self._cancel.reset()
+
         # print("-------------------------")
         self._game.place(column)
 
-    def get_winning_move(self):
+    def get_winning_move(self, spots=None):
         """
         Checks whether there is a winning column available for the next
         move of the bot.
 
+        :param spots: result of winning_drop_spots() for the current board, computed if not given
         :return: winning column
         """
-        column = None
-        for c_win in range(self._game._cols):
-            for r in range(self._game._rows):
-                if self._game._board[c_win][r] == 0:
-                    self._game._board[c_win][r] = self._game._turn
-                    is_winner = self._game.check_win((c_win, r))
-                    self._game._board[c_win][r] = 0
-                    if is_winner:
-                        column = c_win
-                        return column
-                    break
-        return column
+        if spots is None:
+            spots = winning_drop_spots(self._game._board)
+        return first_column(spots[self._game._turn])
 
     def get_valid_locations(self, board):
         """
@@ -149,69 +168,92 @@ class Bot(Observer):
         column = random.choice(free_cols)
         return column
 
-    def get_defensive_move(self):
+    def get_defensive_move(self, spots=None):
         """
         Checks whether the bot could play a move that blocks a direct winning
         move from the opponent.
 
+        :param spots: result of winning_drop_spots() for the current board, computed if not given
         :return: column to be played to avoid losing immediatly
         """
-        column = None
-        for c_win in range(self._game._cols):
-            for r in range(self._game._rows):
-                if self._game._board[c_win][r] == 0:
-                    self._game._board[c_win][r] = -1 * self._game._turn
-                    is_winner = self._game.check_win((c_win, r))
-                    self._game._board[c_win][r] = 0
-                    if is_winner:
-                        column = c_win
-                        return column
-                    break
-        return column
+        if spots is None:
+            spots = winning_drop_spots(self._game._board)
+        return first_column(spots[-self._game._turn])
 
 
-class Node:
+class MiniMax(Bot):
     """
-    This class is used to represent nodes of the tree of boards used during
-    Monte-Carlo Tree Search.
+    This class is responsible for the Minimax algorithm.
+    At each depth, the algorithm will simulate up to 7 boards, each having a piece that has been dropped in a free column. So with depth 1, we will have 7 boards to analyse, with depth 2 : 49 ,...
+    Through a system of reward each board will be attributed a score. The Minimax will then either try to minimise or maximise the rewards depending on the depth (odd or even). Indeed, because we are using multiple
+    depth, the minimax algorithm will simulate in alternance the possible moves of the current player and the ones of the adversary (creating Min nodes and max nodes). The player that needs to decide where to
+    drop a piece on the current board is considered as the maximising player, hence trying to maximise the reward when a max nodes is encountered. The algorithm will also consider that the adversary plays as good as possible (with
+    the information available with the depth chosen) and hence try to minimise the reward when possible (minimizing player).
+    So after creating all the boards of the tree, at each depth, a board will be selected based on the reward and on the type of nodes (min or max node) starting from the bottom of the tree.
+    The final choice is made based on the 7 boards possible with the score updated through the reward procedure describe above.
+    Note that the larger the depth, the slower the execution.
+    In order to avoid unnecessary exploration of boards, an alpha beta pruning has 
+        print(self._game._turn, self._game._round)been implemented.
     """
 
-    def __init__(self, state, parent=None):
-        self.visits = 1
-        self.reward = 0.0
-        self.state = state  # Instance of Connect4Game
-        self.children = []
-        self.children_moves = []
-        self.parent = parent
-
-    def add_child(self, child_state, move):
+    def __init__(self, game, depth, pruning=True, workers=1, progress=None, cancel=None):
         """
-        Add a child to the current node.
-
-        :param child_state: state of the child to add
-        :param move: move to do to get to the newly added child
+        :param workers: number of processes searching each move together (Lazy SMP), 1 searches in-process
+        :param progress: see Bot
+        :param cancel: see Bot
         """
-        child = Node(child_state, parent=self)
-        self.children.append(child)
-        self.children_moves.append(move)
+        super().__init__(game, bot_type=MINIMAX, depth=depth, pruning=pruning, progress=progress, cancel=cancel)
+        self._last_score = None
+        self._workers = workers
+        self._table = None
+        self._release_table = None
 
-    def update(self, reward):
+    def minimax(self, board, depth, alpha, beta, maximizingPlayer, pruning):
         """
-        Update the node's reward (indicates how good a certain node is
-        according to the MCTS algorithm)
-
-        :param reward: reward to be added to the node
+        Main function of minimax, called whenever a move is needed.
+        Recursive function, depth of the recursion being determined by the parameter depth.
+        :param depth: number of iterations the Minimax algorith will run for
+            (the larger the depth the longer the algorithm takes)
+        :alpha: used for the pruning, correspond to the lowest value of the range values of the node
+        :beta: used for the pruning, correspond to the hihest value of the range values of the node
+        :maximizingPlayer: boolean to specify if the algorithm should maximize or minimize the reward
+        :pruning: boolean to specify if the algorithm uses the pruning
+        :return: column where to place the piece
         """
-        self.reward += reward
-        self.visits += 1
+        board = mm.BoardMinimax(self._game._board, self._game._turn, self._game._round)
+        # The score of our previous move is a good guess of the score of this one
+        if self._workers > 1:
+            # Only imported when used, multiprocessing.shared_memory is slow to import
+            import smp
 
-    def fully_explored(self):
-        """
-        Checks if the node is fully explored (which means we can not add
-        any more children to this node)
+            if self._table is None:
+                # Kept for the whole game, allocating and zeroing a new table for each move is slow
+                self._table = smp.SharedTranspositionTable()
+                self._release_table = weakref.finalize(self, smp.release, self._table)
+            column, score = smp.solve_parallel(
+                board,
+                depth,
+                self._workers,
+                guess=self._last_score,
+                table=self._table,
+                progress=self._progress,
+                cancel=self._cancel,
+            )
+        else:
+            column, score = mm.solve(
+                board, depth, guess=self._last_score, progress=self._progress, cancel=self._cancel
+            )
+        # A cancelled search only returns a lower bound, a poor guess for the next move
+        if self._cancel is None or not self._cancel.cancelled:
+            self._last_score = score
+        return column, score
 
-        :return: True of False depending on if it is fully epxlored or not
+    def close(self):
+        """
+        Frees the shared transposition table of the parallel search, it is otherwise freed when the
+        bot is garbage collected or at exit.
         """
-        if len(self.children) == len(self.state.get_valid_locations()):
-            return True
-        return False
+        if self._release_table is not None:
+            self._release_table()
+            self._table = None
+            self._release_table = None
@@ -1,4 +1,6 @@
+import collections
 import enum
+import threading
 
 EMPTY = 0
 ROW_COUNT = 6
@@ -20,19 +22,34 @@ class Event(enum.Enum):
 
 
 class Observable:
+    """
+    Observers are kept as (observer, event types or None) pairs in a list that is replaced, never
+    modified, so notify can iterate it without locking while other threads add or remove observers.
+    """
+
     def __init__(self):
         self._observers = []
+        self._lock = threading.Lock()
 
     def notify(self, event, *argv):
-        for obs in self._observers:
-            obs.update(self, event, *argv)
+        observers = self._observers
+        if not observers:
+            return
+        for obs, events in observers:
+            if events is None or event in events:
+                obs.update(self, event, *argv)
 
-    def add_observer(self, obs):
-        self._observers.append(obs)
+    def add_observer(self, obs, events=None):
+        """
+        :param obs: Observer instance
+        :param events: event types the observer wants, all of them if None
+        """
+        with self._lock:
+            self._observers = self._observers + [(obs, None if events is None else frozenset(events))]
 
     def remove_observer(self, obs):
-        if obs in self._observers:
-            self._observers.remove(obs)
+        with self._lock:
+            self._observers = [entry for entry in self._observers if entry[0] is not obs]
 
 
 class Observer:
@@ -41,3 +58,117 @@ class Observer:
 
     def update(self, obj, event, *argv):
         pass
+
+
+class AsyncObserver(Observer):
+    """
+    Forwards events to another observer from its own thread, so a slow observer (such as the viewer
+    redrawing the board) does not slow down the game. Consecutive queued events of a coalesced type
+    from the same observable are merged, only the latest one is delivered.
+    """
+
+    def __init__(self, observer, coalesce=(Event.PIECE_PLACED,)):
+        """
+        :param observer: Observer receiving the events
+        :param coalesce: event types for which only the latest pending event matters
+        """
+        super().__init__()
+        self._observer = observer
+        self._coalesce = frozenset(coalesce)
+        self._queue = collections.deque()
+        self._condition = threading.Condition()
+        self._busy = False
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def update(self, obj, event, *argv):
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("event sent to a closed AsyncObserver")
+            queue = self._queue
+            if queue and event in self._coalesce and queue[-1][0] is obj and queue[-1][1] == event:
+                queue[-1] = (obj, event, argv)
+            else:
+                queue.append((obj, event, argv))
+            self._condition.notify_all()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._busy = False
+                self._condition.notify_all()
+                while not self._queue and not self._closed:
+                    self._condition.wait()
+                if not self._queue:
+                    return
+                obj, event, argv = self._queue.popleft()
+                self._busy = True
+            self._observer.update(obj, event, *argv)
+
+    def flush(self):
+        """
+        Waits until every queued event has been delivered.
+        """
+        with self._condition:
+            while self._queue or self._busy:
+                self._condition.wait()
+
+    def close(self):
+        """
+        Delivers the pending events and stops the thread.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+
+
+Progress = collections.namedtuple(
+    "Progress", ["lower", "upper", "best_move", "nodes", "elapsed", "nodes_per_second", "value", "done"]
+)
+Progress.__doc__ = """
+A progress report of a search.
+lower, upper: bounds proven so far on the score of the position, None for MCTS
+best_move: best column found so far, numbered from 0, or None
+nodes: nodes searched (negamax calls, or MCTS iterations)
+elapsed: seconds since the search started
+nodes_per_second: nodes / elapsed
+value: mean reward of best_move for MCTS, None for the solver
+done: True for the last report, sent when the search finishes or is cancelled
+"""
+
+
+class CancelToken:
+    """
+    Passed to a search and cancelled from any thread, the search then stops at its next check and
+    returns the best result found so far.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    def reset(self):
+        """
+        Makes the token usable for the next search.
+        """
+        self._event.clear()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+
+class SearchProgress:
+    """
+    Polling handle: pass it as the progress callback of a search and read `latest` from another thread.
+    """
+
+    def __init__(self):
+        self.latest = None
+
+    def __call__(self, progress):
+        self.latest = progress
@@ -1,31 +1,13 @@
-from copy import deepcopy
 import random
-import pygame
-import pygame.gfxdraw
-from bot import Bot
+from bot import Bot, MiniMax
 from common import (
     Event,
     MONTE_CARLO,
     MINIMAX,
     ROW_COUNT,
     COLUMN_COUNT,
-    SQUARE_SIZE,
     Observable,
-    Observer,
 )
-from minimax import MiniMax
-
-
-# Graphical size settings
-DISC_SIZE_RATIO = 0.8
-
-# Colours
-BLUE_COLOR = (23, 93, 222)
-YELLOW_COLOR = (255, 240, 0)
-RED_COLOR = (255, 0, 0)
-BACKGROUND_COLOR = (19, 72, 162)
-BLACK_COLOR = (0, 0, 0)
-WHITE_COLOR = (255, 255, 255)
 
 
 class Connect4Game(Observable):
@@ -40,6 +22,8 @@ class Connect4Game(Observable):
         depth2=None,
         pruning1=True,
         pruning2=True,
+        workers1=1,
+        workers2=1,
     ):
         """
         Constructor of the Connect4Game class.
@@ -51,6 +35,8 @@ class Connect4Game(Observable):
         :param iteration: number of iterations used by the players using MCTS
         :param depth1: depth used in the MiniMax algorithm of player1, it is uses MiniMax
         :param depth2: depth used in the MiniMax algorithm of player2, it is uses MiniMax
+        :param workers1: number of processes searching each move of player1 if it uses MiniMax (Lazy SMP)
+        :param workers2: number of processes searching each move of player2 if it uses MiniMax (Lazy SMP)
         """
         super().__init__()
         self._rows = rows
@@ -63,13 +49,13 @@ class Connect4Game(Observable):
         self.moves = {1: [], -1: []}
         self.reset_game()
         if player1 == MINIMAX:
-            self._player1 = MiniMax(self, depth=depth1, pruning=pruning1)
+            self._player1 = MiniMax(self, depth=depth1, pruning=pruning1, workers=workers1)
         else:
             self._player1 = Bot(self, bot_type=player1, iteration=iteration)
         if player2 == MINIMAX:
-            self._player2 = MiniMax(self, depth=depth2, pruning=pruning2)
+            self._player2 = MiniMax(self, depth=depth2, pruning=pruning2, workers=workers2)
         else:
-            self._player2 = Bot(self, bot_type=player2)
+            self._player2 = Bot(self, bot_type=player2, iteration=iteration)
         self.last_move = None
 
     def reset_game(self):
@@ -221,24 +207,6 @@ class Connect4Game(Observable):
         """
         return self._board[c][r]
 
-    def copy_state(self):
-        """
-        Use this instead of the copy() method. Useful as we don't want our graphical interface (viewed as an Observer in this class)
-        to be updated when we are playing moves in our tree search.
-        """
-
-        # Temporary removes the
-        temporary_observers = self._observers
-        self._observers = []
-
-        new_one = deepcopy(self)
-        new_one._observers.clear()  # Clear observers, such as GUI in our case.
-
-        # Reassign the observers after deepcopy
-        self._observers = temporary_observers
-
-        return new_one
-
     def bot_place(self):
         """
         Calls the bots whenever they need to play their moves
@@ -261,104 +229,10 @@ class Connect4Game(Observable):
         return free_cols
 
 
-class Connect4Viewer(Observer):
-    def __init__(self, game):
-        super(Observer, self).__init__()
-        assert game is not None
-        self._game = game
-        self._game.add_observer(self)
-        self._screen = None
-        self._font = None
-
-    def initialize(self):
-        """
-        Initialises the view window
-        """
-        pygame.init()
-        pygame.display.set_caption("Connect Four")
-        self._font = pygame.font.SysFont(None, 70)
-        self._screen = pygame.display.set_mode(
-            [
-                self._game.get_cols() * SQUARE_SIZE,
-                self._game.get_rows() * SQUARE_SIZE,
-            ]
-        )
-        self.draw_board()
-
-    def draw_board(self):
-        """
-        Draws board[c][r] with c = 0 and r = 0 being bottom left
-        0 = empty (background colour)
-        1 = yellow
-        2 = red
-        """
-        self._screen.fill(BLUE_COLOR)
-
-        for r in range(self._game.get_rows()):
-            for c in range(self._game.get_cols()):
-                colour = BACKGROUND_COLOR
-                if self._game.board_at(c, r) == 1:
-                    colour = YELLOW_COLOR
-                if self._game.board_at(c, r) == -1:
-                    colour = RED_COLOR
-
-                # Anti-aliased circle drawing
-                pygame.gfxdraw.aacircle(
-                    self._screen,
-                    c * SQUARE_SIZE + SQUARE_SIZE // 2,
-                    self._game.get_rows() * SQUARE_SIZE
-                    - r * SQUARE_SIZE
-                    - SQUARE_SIZE // 2,
-                    int(DISC_SIZE_RATIO * SQUARE_SIZE / 2),
-                    colour,
-                )
-
-                pygame.gfxdraw.filled_circle(
-                    self._screen,
-                    c * SQUARE_SIZE + SQUARE_SIZE // 2,
-                    self._game.get_rows() * SQUARE_SIZE
-                    - r * SQUARE_SIZE
-                    - SQUARE_SIZE // 2,
-                    int(DISC_SIZE_RATIO * SQUARE_SIZE / 2),
-                    colour,
-                )
-        pygame.display.update()
-
-    def update(self, obj, event, *argv):
-        """
-        Called when notified. Updates the view.
-        """
-        if event == Event.GAME_WON:
-            won = argv[0]
-            self.draw_win_message(won)
-        elif event == Event.GAME_RESET:
-            self.draw_board()
-        elif event == Event.PIECE_PLACED:
-            self.draw_board()
-
-    def draw_win_message(self, won):
-        """
-        Displays win message on top of the board
-        """
-        if won == 1:
-            img = self._font.render(
-                f"Yellow won ({self._game._player1})",
-                True,
-                BLACK_COLOR,
-                YELLOW_COLOR,
-            )
-        elif won == -1:
-            img = self._font.render(
-                f"Red won ({self._game._player2})", True, WHITE_COLOR, RED_COLOR
-            )
-        else:
-            img = self._font.render("Draw", True, WHITE_COLOR, BLUE_COLOR)
-
-        rect = img.get_rect()
-        rect.center = (
-            (self._game.get_cols() * SQUARE_SIZE) // 2,
-            (self._game.get_rows() * SQUARE_SIZE) // 2,
-        )
+def __getattr__(name):
+    # The viewer needs pygame, it is only imported when something asks for it
+    if name == "Connect4Viewer":
+        from viewer import Connect4Viewer
 
-        self._screen.blit(img, rect)
-        pygame.display.update()
+        return Connect4Viewer
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,239 @@
+import argparse
+import array
+import bisect
+import mmap
+import struct
+import sys
+import minimax as mm
+from common import ROW_COUNT, COLUMN_COUNT
+
+MAGIC = b"C4EG"
+VERSION = 1
+# magic, version, max_empty, flags, number of entries
+HEADER = struct.Struct("<4sBBBxQ")
+# Only positions with exactly max_empty empty cells are stored
+SINGLE_LAYER = 1
+NO_MOVE = 7
+
+
+class EndgameDatabase:
+    """
+    Read-only view over an endgame file written by generate().
+    The file holds a sorted array of position keys followed by one packed entry per key
+    (score << 3 | best column), it is memory-mapped so loading it costs nothing up front.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: file written by generate()
+        """
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, max_empty, flags, count = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not an endgame database")
+        self.max_empty = max_empty
+        self.min_rounds = ROW_COUNT * COLUMN_COUNT - max_empty
+        # negamax does not probe positions past max_rounds, they cannot be in the file
+        self.max_rounds = self.min_rounds if flags & SINGLE_LAYER else ROW_COUNT * COLUMN_COUNT
+        view = memoryview(self._mmap)
+        keys_end = HEADER.size + 8 * count
+        self._keys = view[HEADER.size:keys_end].cast("Q")
+        self._entries = view[keys_end:keys_end + 2 * count].cast("h")
+
+    def __len__(self):
+        return len(self._keys)
+
+    def lookup(self, key):
+        """
+        :param key: BoardMinimax.key() of the position
+        :return: (best column or None, exact score) or None if the position is not stored
+        """
+        index = bisect.bisect_left(self._keys, key)
+        if index == len(self._keys) or self._keys[index] != key:
+            return None
+        entry = self._entries[index]
+        col = entry & 7
+        return (None if col == NO_MOVE else col), entry >> 3
+
+    def probe(self, board):
+        return self.lookup(board.key())
+
+    def close(self):
+        if hasattr(self, "_keys"):
+            self._keys.release()
+            self._entries.release()
+        self._mmap.close()
+        self._file.close()
+
+
+class PositionRecorder:
+    """
+    Installed as mm.ENDGAME_DATABASE, records the positions with exactly min_rounds discs that negamax
+    visits and lets it search them.
+    """
+
+    def __init__(self, min_rounds):
+        self.min_rounds = self.max_rounds = min_rounds
+        self.positions = {}
+
+    def probe(self, board):
+        key = board.key()
+        if key not in self.positions:
+            self.positions[key] = board.copy()
+        return None
+
+
+def load(path):
+    """
+    Opens the database and makes negamax probe it, the database loaded before is closed.
+
+    :param path: file written by generate()
+    :return: the EndgameDatabase instance
+    """
+    previous = mm.ENDGAME_DATABASE
+    mm.ENDGAME_DATABASE = EndgameDatabase(path)
+    if isinstance(previous, EndgameDatabase):
+        previous.close()
+    return mm.ENDGAME_DATABASE
+
+
+def solve_exact(board, table):
+    """
+    Exact score of a position by exhaustive search, memoised in table.
+    Follows the same scoring rules as negamax so probing the database does not change results.
+
+    :param board: BoardMinimax instance
+    :param table: dict key -> (column, score) filled with every position of the subtree
+    :return: (best column or NO_MOVE, score)
+    """
+    key = board.key()
+    if key in table:
+        return table[key]
+
+    valid_moves = [col for col in mm.COLUMN_ORDER if board.can_play(col)]
+    if board.rounds == ROW_COUNT * COLUMN_COUNT or not valid_moves:
+        result = (NO_MOVE, 0)
+    else:
+        result = None
+        for col in valid_moves:
+            if board.winning_move(col):
+                result = (col, (ROW_COUNT * COLUMN_COUNT + 1 - board.rounds) // 2)
+                break
+        if result is None and board.possible_no_lossing_moves() == 0:
+            result = (NO_MOVE, -((ROW_COUNT * COLUMN_COUNT - board.rounds) // 2))
+        if result is None:
+            for col in valid_moves:
+                b_copy = board.copy()
+                b_copy.play(col)
+                score = -solve_exact(b_copy, table)[1]
+                if result is None or score > result[1]:
+                    result = (col, score)
+
+    table[key] = result
+    return result
+
+
+def _expand(board, min_rounds, extend, table):
+    """
+    Walks every continuation of board until it reaches min_rounds, then solves the subtree.
+    """
+    if board.rounds >= min_rounds:
+        solve_exact(board, table)
+        return
+    if min_rounds - board.rounds > extend:
+        return
+    for col in mm.COLUMN_ORDER:
+        if board.can_play(col) and not board.winning_move(col):
+            b_copy = board.copy()
+            b_copy.play(col)
+            _expand(b_copy, min_rounds, extend, table)
+
+
+def visited_positions(move_strings, min_rounds):
+    """
+    Solves the positions the way the benchmark does (from empty tables) and collects the positions
+    with exactly min_rounds discs that negamax visits, those are the ones a database with this
+    threshold gets probed with when the same positions are solved again.
+
+    :param move_strings: positions as strings of columns numbered from 1, like the Test_* files
+    :param min_rounds: number of discs of the collected positions
+    :return: dict key -> BoardMinimax
+    """
+    recorder = PositionRecorder(min_rounds)
+    database = mm.ENDGAME_DATABASE
+    mm.ENDGAME_DATABASE = recorder
+    try:
+        for moves in move_strings:
+            mm.solve_fresh(mm.BoardMinimax.from_moves(moves))
+    finally:
+        mm.ENDGAME_DATABASE = database
+    return recorder.positions
+
+
+def generate(move_strings, max_empty, path, extend=0, search_cache=False):
+    """
+    Solves positions with max_empty empty cells related to the given games and writes them to path.
+
+    :param move_strings: games as strings of columns numbered from 1, like the Test_* files
+    :param max_empty: largest number of empty cells of a stored position
+    :param path: output file
+    :param extend: seeds with up to max_empty + extend empty cells are expanded over all their
+        continuations (the cost grows as 7 ** extend per seed), others are skipped
+    :param search_cache: instead of every position with at most max_empty empty cells reachable from
+        the games, store the positions with max_empty empty cells that solve visits when solving
+        move_strings (see visited_positions()). That file is a cache of the searches of these exact
+        positions: it only saves nodes when they are solved again, not on other positions
+    :return: number of stored positions
+    """
+    min_rounds = ROW_COUNT * COLUMN_COUNT - max_empty
+    table = {}
+    if search_cache:
+        database = mm.ENDGAME_DATABASE
+        mm.ENDGAME_DATABASE = None
+        try:
+            mm.TRANSPOSITION_TABLE.clear()
+            for key, board in visited_positions(move_strings, min_rounds).items():
+                col, score = mm.solve(board, ROW_COUNT * COLUMN_COUNT)
+                table[key] = (NO_MOVE if col is None else col, score)
+        finally:
+            mm.ENDGAME_DATABASE = database
+    else:
+        for moves in move_strings:
+            _expand(mm.BoardMinimax.from_moves(moves), min_rounds, extend, table)
+
+    keys = array.array("Q", sorted(table))
+    entries = array.array("h", [(table[key][1] << 3) | table[key][0] for key in keys])
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, max_empty, SINGLE_LAYER if search_cache else 0, len(keys)))
+        f.write(keys.tobytes())
+        f.write(entries.tobytes())
+    return len(keys)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the Connect 4 endgame database")
+    parser.add_argument("tests", nargs="+", help="Test_* files whose positions seed the database")
+    parser.add_argument("--max-empty", "-k", type=int, default=14, help="Empty cells of the stored positions")
+    parser.add_argument(
+        "--search-cache",
+        action="store_true",
+        help="Store the positions with K empty cells that solve visits on the seeds instead of every position "
+        "reachable from them. This caches the searches of the seeds, it does not speed up other positions",
+    )
+    parser.add_argument("--extend", type=int, default=0, help="Plies to expand seeds above the threshold")
+    parser.add_argument("--limit", "-n", type=int, default=None, help="Positions taken from each Test_* file")
+    parser.add_argument("--output", "-o", default="endgame.db", help="Output file")
+    args = parser.parse_args()
+
+    move_strings = []
+    for test in args.tests:
+        with open(test, "r") as f:
+            move_strings.extend([line.split(" ")[0] for line in f if line.strip()][:args.limit])
+    count = generate(move_strings, args.max_empty, args.output, args.extend, args.search_cache)
+    print(f"{count} positions written to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,13 @@
 import pygame
 import pygame.gfxdraw
 import time
-from connect4game import Connect4Game, Connect4Viewer
+from connect4game import Connect4Game
+from viewer import Connect4Viewer
 import time
 from common import MONTE_CARLO, MINIMAX, RANDOM, SQUARE_SIZE
 import sys
 import argparse
+import profiling
 
 
 def main():
@@ -24,6 +26,21 @@ def main():
         choices=("random", "human"),
         default="human",
     )
+    parser.add_argument(
+        "--workers",
+        "-j",
+        type=int,
+        default=1,
+        help="Number of processes searching each move of the MiniMax player (Lazy SMP)",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="FOLDED_FILE",
+        help="Time the hot paths and print a summary at exit, optionally writing folded stacks for flamegraph.pl",
+    )
     # parser.add_argument(
     #     "--player2",
     #     "--p2",
@@ -35,6 +52,10 @@ def main():
     #     default="random",
     # )
     args = parser.parse_args()
+    if args.profile is not None:
+        profiling.enable(args.profile or None)
+    else:
+        profiling.enable_from_env()
 
     nb_Games = 1
     total_games_won = [0, 0]
@@ -50,7 +71,7 @@ def main():
     # if args.player2 == "random":
     p[1] = MINIMAX
 
-    game = Connect4Game(p[0], p[1], iteration=500, depth1=5, depth2=5)
+    game = Connect4Game(p[0], p[1], iteration=500, depth1=5, depth2=5, workers2=args.workers)
     view = Connect4Viewer(game=game)
     view.initialize()
 
@@ -0,0 +1,243 @@
+import array
+import math
+import random
+import time
+import minimax as mm
+from common import ROW_COUNT, COLUMN_COUNT, Progress
+
+# Outcome of a node for the player who moved into it
+ONGOING = 0
+WON = 1
+DRAW = 2
+
+# Iterations between two progress reports
+PROGRESS_ITERATIONS = 256
+
+
+class MCTSTree:
+    """
+    Monte-Carlo search tree stored in parallel typed arrays indexed by node id instead of Node objects.
+    The children of a node are created together and stored contiguously, a node only keeps the offset
+    of its first child and their number. Positions are bitboards (position of the player to move, mask),
+    as in BoardMinimax.
+    The tree is kept between moves: advance() re-roots it on the position reached, so the statistics
+    already gathered for that subtree are reused by the next search.
+    """
+
+    def __init__(self, position=0, mask=0, rounds=0):
+        self.reset(position, mask, rounds)
+
+    def reset(self, position, mask, rounds):
+        """
+        Drops the whole tree and starts again from a single root.
+        """
+        self.visits = array.array("I")
+        self.rewards = array.array("d")
+        self.parent = array.array("i")
+        self.first_child = array.array("i")
+        self.child_count = array.array("B")
+        self.move = array.array("b")
+        self.outcome = array.array("B")
+        self.position = array.array("Q")
+        self.mask = array.array("Q")
+        self.rounds = array.array("B")
+        self.root = self._add(-1, -1, position, mask, rounds, ONGOING)
+
+    def __len__(self):
+        return len(self.visits)
+
+    def _add(self, parent, move, position, mask, rounds, outcome):
+        self.visits.append(0)
+        self.rewards.append(0.0)
+        self.parent.append(parent)
+        self.first_child.append(-1)
+        self.child_count.append(0)
+        self.move.append(move)
+        self.outcome.append(outcome)
+        self.position.append(position)
+        self.mask.append(mask)
+        self.rounds.append(rounds)
+        return len(self.visits) - 1
+
+    def _board(self, node):
+        board = mm.BoardMinimax([], 0, self.rounds[node])
+        board.position = self.position[node]
+        board.mask = self.mask[node]
+        return board
+
+    def _expand(self, node):
+        """
+        Creates every child of node at once, at the end of the arrays.
+        """
+        board = self._board(node)
+        first = len(self.visits)
+        for col in mm.COLUMN_ORDER:
+            if not board.can_play(col):
+                continue
+            if board.winning_move(col):
+                outcome = WON
+            elif board.rounds + 1 == ROW_COUNT * COLUMN_COUNT:
+                outcome = DRAW
+            else:
+                outcome = ONGOING
+            child = board.copy()
+            child.play(col)
+            self._add(node, col, child.position, child.mask, child.rounds, outcome)
+        self.first_child[node] = first
+        self.child_count[node] = len(self.visits) - first
+
+    def _select(self, factor):
+        """
+        Walks down with UCB from the root, expanding the first leaf it meets.
+
+        :return: the node to simulate from
+        """
+        node = self.root
+        while self.outcome[node] == ONGOING:
+            if self.first_child[node] < 0:
+                self._expand(node)
+            first = self.first_child[node]
+            best = -1
+            best_value = -1.0
+            log_visits = math.log(self.visits[node] or 1)
+            for child in range(first, first + self.child_count[node]):
+                visits = self.visits[child]
+                if not visits:
+                    return child
+                value = self.rewards[child] / visits + factor * math.sqrt(2 * log_visits / visits)
+                if value > best_value:
+                    best = child
+                    best_value = value
+            node = best
+        return node
+
+    def _simulate(self, node):
+        """
+        Plays random moves from node until the game ends.
+
+        :return: reward of the game for the player who moved into node
+        """
+        if self.outcome[node] == WON:
+            return 1.0
+        if self.outcome[node] == DRAW:
+            return 0.5
+        board = self._board(node)
+        # True while the player to move in board is the opponent of the player who moved into node
+        opponent = True
+        while board.rounds < ROW_COUNT * COLUMN_COUNT:
+            col = random.choice([c for c in range(COLUMN_COUNT) if board.can_play(c)])
+            if board.winning_move(col):
+                return 0.0 if opponent else 1.0
+            board.play(col)
+            opponent = not opponent
+        return 0.5
+
+    def _backpropagate(self, node, reward):
+        while node >= 0:
+            self.visits[node] += 1
+            self.rewards[node] += reward
+            reward = 1.0 - reward
+            node = self.parent[node]
+
+    def search(self, iteration, factor=2.0, progress=None, cancel=None):
+        """
+        :param iteration: number of selection / simulation / backpropagation rounds
+        :param factor: exploration factor of the UCB formula
+        :param progress: optional callable receiving a common.Progress every PROGRESS_ITERATIONS
+            iterations and at the end, such as a common.SearchProgress handle
+        :param cancel: optional common.CancelToken, checked before each iteration, once cancelled the
+            most visited column so far is returned
+        :return: the most visited column from the root
+        """
+        if self.first_child[self.root] < 0:
+            self._expand(self.root)
+        start = time.perf_counter()
+        done = 0
+        for done in range(1, iteration + 1):
+            if cancel is not None and cancel.cancelled:
+                done -= 1
+                break
+            node = self._select(factor)
+            self._backpropagate(node, self._simulate(node))
+            if progress is not None and not done % PROGRESS_ITERATIONS:
+                self._report(progress, done, start, False)
+        if progress is not None:
+            self._report(progress, done, start, True)
+        return self.move[self._best_child()]
+
+    def _best_child(self):
+        first = self.first_child[self.root]
+        children = range(first, first + self.child_count[self.root])
+        return max(children, key=lambda child: self.visits[child])
+
+    def _report(self, progress, iterations, start, done):
+        best = self._best_child()
+        visits = self.visits[best]
+        elapsed = time.perf_counter() - start
+        progress(
+            Progress(
+                None,
+                None,
+                self.move[best],
+                iterations,
+                elapsed,
+                iterations / elapsed if elapsed > 0 else 0.0,
+                self.rewards[best] / visits if visits else None,
+                done,
+            )
+        )
+
+    def advance(self, position, mask, rounds):
+        """
+        Re-roots the tree on a position reached from the root in one or two moves (our move, then the
+        opponent's), keeping its statistics. The tree is reset if the position is not in it.
+        """
+        key = position + mask
+        frontier = [self.root]
+        for _ in range(rounds - self.rounds[self.root] + 1):
+            for node in frontier:
+                if self.position[node] + self.mask[node] == key and self.rounds[node] == rounds:
+                    self.root = node
+                    self.compact()
+                    return
+            frontier = [
+                child
+                for node in frontier
+                if self.first_child[node] >= 0
+                for child in range(self.first_child[node], self.first_child[node] + self.child_count[node])
+            ]
+        self.reset(position, mask, rounds)
+
+    def compact(self):
+        """
+        Copies the subtree of the root to new arrays, dropping the nodes that can no longer be reached.
+        """
+        old = (
+            self.visits,
+            self.rewards,
+            self.first_child,
+            self.child_count,
+            self.move,
+            self.outcome,
+            self.position,
+            self.mask,
+            self.rounds,
+        )
+        visits, rewards, first_child, child_count, move, outcome, position, mask, rounds = old
+        old_root = self.root
+        self.reset(position[old_root], mask[old_root], rounds[old_root])
+        self.visits[0] = visits[old_root]
+        self.rewards[0] = rewards[old_root]
+        # Breadth-first, so that the children of a node stay contiguous
+        queue = [(old_root, 0)]
+        for old_node, new_node in queue:
+            first = first_child[old_node]
+            if first < 0:
+                continue
+            self.first_child[new_node] = len(self.visits)
+            self.child_count[new_node] = child_count[old_node]
+            for child in range(first, first + child_count[old_node]):
+                new_child = self._add(new_node, move[child], position[child], mask[child], rounds[child], outcome[child])
+                self.visits[new_child] = visits[child]
+                self.rewards[new_child] = rewards[child]
+                queue.append((child, new_child))
@@ -1,45 +1,196 @@
-from bot import Bot
-from common import ROW_COUNT, COLUMN_COUNT, MINIMAX
-import math
+import time
+from common import ROW_COUNT, COLUMN_COUNT, Progress
+from bitboard import (
+    PRECOMPUTED_TOP_MASKS,
+    BOTTOM_MASK_COL,
+    COLUMN_MASK,
+    BOTTOM_MASK,
+    BOARD_MASK,
+    compute_winning_position,
+    alignment,
+    from_grid,
+)
 
 
 COLUMN_ORDER = [3, 2, 4, 1, 5, 0, 6]
-PRECOMPUTED_TOP_MASKS = [(1 << (ROW_COUNT - 1)) << col * (ROW_COUNT + 1) for col in range(COLUMN_COUNT)]
-BOTTOM_MASK_COL = [1 << col * (ROW_COUNT + 1) for col in range(COLUMN_COUNT)]
-COLUMN_MASK = [((1 << ROW_COUNT) - 1) << col * (ROW_COUNT + 1) for col in range(COLUMN_COUNT)]
-MIN_SCORE = -(ROW_COUNT*COLUMN_COUNT)/2 + 3;
+MIN_SCORE = -(ROW_COUNT*COLUMN_COUNT)//2
 # use this to change the order of the columns
 # for i in range(COLUMN_COUNT):
 #     self.columnOrder[i] = COLUMN_COUNT//2 + (1 - 2*(i % 2))*(i+1)//2
 
 
+UPPER_BOUND = 0
+LOWER_BOUND = 1
+NO_MOVE = 7
+
+
 class TranspositionTable:
+    """
+    Maps position keys to a single int packing the score bound (6 bits, offset by MIN_SCORE),
+    the bound type (1 bit) and the best or refuting column (3 bits).
+    """
+
     def __init__(self):
         self.table = {}
 
-    def store(self, key, value):
-        self.table[key] = value
+    @staticmethod
+    def pack(score, bound, move):
+        if move is None:
+            move = NO_MOVE
+        return (score - MIN_SCORE + 1) | bound << 6 | move << 7
+
+    @staticmethod
+    def unpack(entry):
+        move = entry >> 7
+        return (entry & 63) + MIN_SCORE - 1, (entry >> 6) & 1, (None if move == NO_MOVE else move)
+
+    def store(self, key, score, bound, move):
+        """
+        :param key: BoardMinimax.key() of the position
+        :param score: bound on the score of the position
+        :param bound: UPPER_BOUND or LOWER_BOUND
+        :param move: best column found, or None
+        """
+        self.table[key] = self.pack(score, bound, move)
 
     def lookup(self, key):
-        return self.table.get(key, None)
+        """
+        :param key: BoardMinimax.key() of the position
+        :return: (score, bound, move or None) or None if the position is not stored
+        """
+        entry = self.table.get(key, None)
+        if entry is None:
+            return None
+        return self.unpack(entry)
+
+    def clear(self):
+        self.table.clear()
 
 
-def bottom(width, height):
-    if width == 0:
-        return 0
-    return bottom(width - 1, height) | 1 << (width - 1) * (height + 1)
+class MoveOrdering:
+    """
+    Orders the moves of negamax. Moves creating the most winning spots for the player are tried first.
+    Killer moves per ply and history scores per side and column, both learnt from beta cutoffs, can be
+    enabled as further keys. COLUMN_ORDER breaks the remaining ties.
+    On the Test_L2 suites the learnt tables cost more nodes than they save, so they are off by default.
+    """
+
+    def __init__(self, killers=False, history=False):
+        """
+        :param killers: try the last two moves that caused a cutoff at the same ply first
+        :param history: prefer columns that caused many cutoffs for the same player
+        """
+        self.use_killers = killers
+        self.use_history = history
+        self.killers = [[None, None] for _ in range(ROW_COUNT * COLUMN_COUNT + 1)]
+        self.history = [[0] * COLUMN_COUNT for _ in range(2)]
+
+    def order(self, board, moves):
+        """
+        :param board: position being searched
+        :param moves: playable columns, already in COLUMN_ORDER
+        :return: the columns in the order they should be searched
+        """
+        killers = self.killers[board.rounds]
+        history = self.history[board.rounds & 1]
+
+        def key(col):
+            k = [-board.threat_count(col)]
+            if self.use_killers:
+                k.append(col != killers[0])
+                k.append(col != killers[1])
+            if self.use_history:
+                k.append(-history[col])
+            return k
+
+        # sorted is stable, so COLUMN_ORDER is kept between equal keys
+        return sorted(moves, key=key)
+
+    def cutoff(self, board, col):
+        """
+        Records that playing col in board caused a beta cutoff.
+        """
+        if not (self.use_killers or self.use_history):
+            return
+        killers = self.killers[board.rounds]
+        if killers[0] != col:
+            killers[1] = killers[0]
+            killers[0] = col
+        self.history[board.rounds & 1][col] += (ROW_COUNT * COLUMN_COUNT - board.rounds) ** 2
+
+    def clear(self):
+        self.killers = [[None, None] for _ in range(ROW_COUNT * COLUMN_COUNT + 1)]
+        self.history = [[0] * COLUMN_COUNT for _ in range(2)]
 
 
 TRANSPOSITION_TABLE = TranspositionTable()
-BOTTOM_MASK = bottom(COLUMN_COUNT, ROW_COUNT)
-BOARD_MASK = BOTTOM_MASK * ((1 << ROW_COUNT) - 1)
+# Set to None to search in plain COLUMN_ORDER
+MOVE_ORDERING = MoveOrdering()
+# Set by endgame.load() to answer positions with few empty cells without searching. negamax calls
+# probe(board) on every position with min_rounds to max_rounds discs, probe returns (column, score)
+# or None to search the position, endgame.PositionRecorder uses it to record the positions visited.
+ENDGAME_DATABASE = None
+
+
+# Number of negamax calls, read by the benchmark
+node_count = 0
+# negamax calls between two progress reports and cancellation checks
+PROGRESS_INTERVAL = 4096
+
+
+class SearchCancelled(Exception):
+    """
+    Raised inside negamax to unwind a cancelled search, solve catches it.
+    """
+
+
+class SearchMonitor:
+    """
+    Keeps the bounds and best move proven so far by solve, reports them to the progress callback and
+    checks the cancel token. It is passed down the negamax calls of one search rather than kept in a
+    global, so searches running on different threads each have their own.
+    """
+
+    def __init__(self, progress, cancel, lower, upper, best_move):
+        self.progress = progress
+        self.cancel = cancel
+        self.lower = lower
+        self.upper = upper
+        self.best_move = best_move
+        self.nodes = 0
+        self.start = time.perf_counter()
+
+    def report(self, done=False):
+        if self.progress is None:
+            return
+        elapsed = time.perf_counter() - self.start
+        nodes_per_second = self.nodes / elapsed if elapsed > 0 else 0.0
+        self.progress(
+            Progress(self.lower, self.upper, self.best_move, self.nodes, elapsed, nodes_per_second, None, done)
+        )
+
+    def tick(self):
+        """
+        Called by negamax every PROGRESS_INTERVAL nodes.
+        """
+        if self.cancel is not None and self.cancel.cancelled:
+            raise SearchCancelled
+        self.report()
 
 
-def negamax(board, depth, alpha, beta):
+def negamax(board, depth, alpha, beta, monitor=None):
+    global node_count
     assert (alpha < beta)
+    node_count += 1
+    if monitor is not None:
+        monitor.nodes += 1
+        if not monitor.nodes % PROGRESS_INTERVAL:
+            monitor.tick()
 
-    if board.possible_no_lossing_moves() == 0:
-        return (None, -((ROW_COUNT * COLUMN_COUNT) - 1 - board.rounds)/2)
+    if ENDGAME_DATABASE is not None and ENDGAME_DATABASE.min_rounds <= board.rounds <= ENDGAME_DATABASE.max_rounds:
+        entry = ENDGAME_DATABASE.probe(board)
+        if entry is not None:
+            return entry
 
     valid_moves = [COLUMN_ORDER[col] for col in range(COLUMN_COUNT) if board.can_play(COLUMN_ORDER[col])]
 
@@ -48,69 +199,182 @@ def negamax(board, depth, alpha, beta):
 
     for col in valid_moves:
         if board.winning_move(col):
-            return col, ((ROW_COUNT * COLUMN_COUNT) + 1 - board.rounds)/2
+            return col, ((ROW_COUNT * COLUMN_COUNT) + 1 - board.rounds) // 2
 
-    max_score = ((ROW_COUNT * COLUMN_COUNT) - 1 - board.rounds)/2
-    val = TRANSPOSITION_TABLE.lookup(board.key())
-    if val:
-        max_score = val + MIN_SCORE - 1
+    if board.possible_no_lossing_moves() == 0:
+        return (None, -(((ROW_COUNT * COLUMN_COUNT) - board.rounds) // 2))
+
+    max_score = ((ROW_COUNT * COLUMN_COUNT) - 1 - board.rounds) // 2
+    hash_move = None
+    entry = TRANSPOSITION_TABLE.lookup(board.key())
+    if entry is not None:
+        score, bound, hash_move = entry
+        if bound == LOWER_BOUND:
+            if alpha < score:
+                alpha = score
+                if alpha >= beta:
+                    return hash_move, alpha
+        elif max_score > score:
+            max_score = score
     if (beta > max_score):
         beta = max_score
         if alpha >= beta:
-            return valid_moves[0], beta
+            return (valid_moves[0] if hash_move is None else hash_move), beta
+
+    if MOVE_ORDERING is not None:
+        valid_moves = MOVE_ORDERING.order(board, valid_moves)
+    if hash_move is not None and hash_move in valid_moves:
+        valid_moves.remove(hash_move)
+        valid_moves.insert(0, hash_move)
 
+    best_col = valid_moves[0]
+    best_score = None
     for col in valid_moves:
         b_copy = board.copy()
         b_copy.play(col)
-        score = -negamax(b_copy, depth - 1, -beta, -alpha)[1]
+        score = -negamax(b_copy, depth - 1, -beta, -alpha, monitor)[1]
         if score >= beta:
+            if MOVE_ORDERING is not None:
+                MOVE_ORDERING.cutoff(board, col)
+            TRANSPOSITION_TABLE.store(board.key(), score, LOWER_BOUND, col)
             return col, score
+        if best_score is None or score > best_score:
+            best_score = score
+            best_col = col
         if score > alpha:
             alpha = score
-    TRANSPOSITION_TABLE.store(board.key(), alpha - MIN_SCORE + 1)
-    return valid_moves[0], alpha
+    TRANSPOSITION_TABLE.store(board.key(), alpha, UPPER_BOUND, best_col)
+    return best_col, alpha
 
 
-def solve(board, depth):
+def solve(board, depth, guess=None, wdl=False, progress=None, cancel=None):
+    """
+    Finds the score of the position with null-window searches.
+    Without a guess the window is halved each time. With a guess, the first searches test scores around
+    it with steps that double on each failure, and halving takes over once the score is bracketed.
+
+    :param board: BoardMinimax instance
+    :param depth: maximum depth of the search
+    :param guess: predicted score, such as the previous score of the same player, defaults to the
+        transposition table entry of the position if there is one
+    :param wdl: stop as soon as the result is known to be a win, a draw or a loss, the returned
+        score is then only a bound with the right sign
+    :param progress: optional callable receiving a common.Progress after each null-window search
+        and every PROGRESS_INTERVAL nodes, such as a common.SearchProgress handle
+    :param cancel: optional common.CancelToken, once cancelled the search stops and the best column
+        and lower bound proven so far are returned
+    :return: (best column, score)
+    """
     min_score = -(ROW_COUNT * COLUMN_COUNT - board.rounds) // 2
     max_score = (ROW_COUNT * COLUMN_COUNT + 1 - board.rounds) // 2
-    best_col = 0
-    while min_score < max_score:
-        med = min_score + (max_score - min_score) // 2
-        if med <= 0 and min_score // 2 < med:
-            med = min_score // 2
-        elif med >= 0 and max_score // 2 > med:
-            med = max_score // 2
-        result = negamax(board, depth, med, med + 1)
-        if result[1] <= med:
-            max_score = result[1]
-        else:
-            min_score = result[1]
-            best_col = result[0]
+    if wdl:
+        min_score = max(min_score, -1)
+        max_score = min(max_score, 1)
+    if guess is None:
+        entry = TRANSPOSITION_TABLE.lookup(board.key())
+        if entry is not None:
+            guess = entry[0]
+    step = 1
+    failed = None
+    best_col = next((col for col in COLUMN_ORDER if board.can_play(col)), None)
+    monitor = None
+    if progress is not None or cancel is not None:
+        monitor = SearchMonitor(progress, cancel, min_score, max_score, best_col)
+    try:
+        while min_score < max_score:
+            if cancel is not None and cancel.cancelled:
+                break
+            if guess is not None:
+                med = min(max(guess, min_score), max_score - 1)
+            else:
+                med = min_score + (max_score - min_score) // 2
+                if med <= 0 and min_score // 2 < med:
+                    med = min_score // 2
+                elif med >= 0 and max_score // 2 > med:
+                    med = max_score // 2
+            result = negamax(board, depth, med, med + 1, monitor)
+            if result[1] <= med:
+                max_score = result[1]
+                if guess is not None:
+                    guess = None if failed == "high" else med - step
+                    failed = "low"
+            else:
+                min_score = result[1]
+                if result[0] is not None:
+                    best_col = result[0]
+                if guess is not None:
+                    guess = None if failed == "low" else med + step
+                    failed = "high"
+            step *= 2
+            if monitor is not None:
+                monitor.lower, monitor.upper, monitor.best_move = min_score, max_score, best_col
+                monitor.report()
+    except SearchCancelled:
+        pass
+    if monitor is not None:
+        monitor.report(done=True)
     return best_col, min_score
 
 
+def solve_fresh(board, depth=ROW_COUNT * COLUMN_COUNT, **kwargs):
+    """
+    Solves a position from empty tables, so neither the result nor the node count depend on earlier
+    searches.
+
+    :param board: BoardMinimax instance
+    :param depth: maximum depth of the search, the default solves the position exactly
+    :param kwargs: other arguments of solve
+    :return: (best column, score, nodes, time in ms)
+    """
+    global node_count
+    TRANSPOSITION_TABLE.clear()
+    if MOVE_ORDERING is not None:
+        MOVE_ORDERING.clear()
+    node_count = 0
+    start = time.perf_counter()
+    col, score = solve(board, depth, **kwargs)
+    return col, score, node_count, 1000 * (time.perf_counter() - start)
+
+
+def solve_next(board, depth, **kwargs):
+    """
+    Solves one position of a sequence, keeping the transposition table of the previous ones when that
+    is sound: full-depth entries hold whatever the root, depth limited scores depend on it, so the
+    table is cleared before a depth limited search.
+
+    :param board: BoardMinimax instance
+    :param depth: maximum depth of the search
+    :param kwargs: other arguments of solve
+    :return: (best column, score)
+    """
+    if depth < ROW_COUNT * COLUMN_COUNT - board.rounds:
+        TRANSPOSITION_TABLE.clear()
+    return solve(board, depth, **kwargs)
+
+
+def parse_moves(moves):
+    """
+    :param moves: string of columns numbered from 1, like the Test_* files
+    :return: list of the columns, numbered from 0
+    """
+    return [int(c) - 1 for c in moves]
+
+
 class BoardMinimax:
     def __init__(self, board, turn, rounds):
+        """
+        :param board: Connect4Game board, or an empty list for an empty board
+        :param turn: player to move (1 or -1), whose discs make up position
+        :param rounds: number of discs already played
+        """
         self.rounds = rounds
         if not board:
             self.position = 0
             self.mask = 0
             return
 
-        self.position = []
-        for col in range(COLUMN_COUNT):
-            for row in range(ROW_COUNT):
-                if board[col][row] == 1:
-                    self.position.append('1')
-                elif board[col][row] == -1:
-                    self.position.append('-1')
-                else:
-                    self.position.append('0')
-            self.position.append('0')
-        self.position = self.position[::-1]
-        self.mask = int(''.join(self.position).replace('-1', '1'), 2)
-        self.position = int(''.join(self.position).replace('-1', '0'), 2)
+        positions, self.mask = from_grid(board)
+        self.position = positions[turn]
 
         # PRINT BOARD
         # test = list(str(bin(self.position))[2:])[::-1]
@@ -122,6 +386,20 @@ class BoardMinimax:
         #     print(''.join(values))
         # print()
 
+    @staticmethod
+    def from_moves(moves):
+        """
+        :param moves: string of columns numbered from 1, like the Test_* files
+        :return: BoardMinimax of the position reached
+        :raises ValueError: if a column is not on the board or full
+        """
+        board = BoardMinimax([], 0, 0)
+        for col in parse_moves(moves):
+            if not 0 <= col < COLUMN_COUNT or not board.can_play(col):
+                raise ValueError(f"{moves}: column {col + 1} cannot be played")
+            board.play(col)
+        return board
+
     def copy(self):
         new_board = BoardMinimax([], 0, 0)
         new_board.position = self.position
@@ -142,28 +420,15 @@ class BoardMinimax:
         pos |= (self.mask + BOTTOM_MASK_COL[col]) & COLUMN_MASK[col]
         return self.alignment(pos)
 
-    def alignment(self, pos):
-        # Horizontal check
-        m = pos & (pos >> (ROW_COUNT + 1))
-        if m & (m >> (2 * (ROW_COUNT + 1))):
-            return True
-
-        # Diagonal check (bottom-left to top-right)
-        m = pos & (pos >> ROW_COUNT)
-        if m & (m >> (2 * ROW_COUNT)):
-            return True
-
-        # Diagonal check (top-left to bottom-right)
-        m = pos & (pos >> (ROW_COUNT + 2))
-        if m & (m >> (2 * (ROW_COUNT + 2))):
-            return True
-
-        # Vertical check
-        m = pos & (pos >> 1)
-        if m & (m >> 2):
-            return True
+    def threat_count(self, col):
+        """
+        :param col: playable column
+        :return: number of empty cells that would complete an alignment for the player after playing col
+        """
+        move = (self.mask + BOTTOM_MASK_COL[col]) & COLUMN_MASK[col]
+        return self.compute_winning_position(self.position | move, self.mask | move).bit_count()
 
-        return False
+    alignment = staticmethod(alignment)
 
     def key(self):
         return self.position + self.mask
@@ -180,36 +445,7 @@ class BoardMinimax:
     def canWinNext(self):
         return self.winning_position() & self.possible()
 
-    @staticmethod
-    def compute_winning_position(position, mask):
-        # vertical
-        r = (position << 1) & (position << 2) & (position << 3)
-
-        # horizontal
-        p = (position << (ROW_COUNT + 1)) & (position << 2 * (ROW_COUNT + 1))
-        r |= p & (position << 3 * (ROW_COUNT + 1))
-        r |= p & (position >> (ROW_COUNT + 1))
-        p >>= 3 * (ROW_COUNT + 1)
-        r |= p & (position << (ROW_COUNT + 1))
-        r |= p & (position >> 3 * (ROW_COUNT + 1))
-
-        # diagonal 1
-        p = (position << ROW_COUNT) & (position << 2 * ROW_COUNT)
-        r |= p & (position << 3 * ROW_COUNT)
-        r |= p & (position >> ROW_COUNT)
-        p >>= 3 * ROW_COUNT
-        r |= p & (position << ROW_COUNT)
-        r |= p & (position >> 3 * ROW_COUNT)
-
-        # diagonal 2
-        p = (position << (ROW_COUNT + 2)) & (position << 2 * (ROW_COUNT + 2))
-        r |= p & (position << 3 * (ROW_COUNT + 2))
-        r |= p & (position >> (ROW_COUNT + 2))
-        p >>= 3 * (ROW_COUNT + 2)
-        r |= p & (position << (ROW_COUNT + 2))
-        r |= p & (position >> 3 * (ROW_COUNT + 2))
-
-        return r & (BOARD_MASK ^ mask)
+    compute_winning_position = staticmethod(compute_winning_position)
 
     def possible_no_lossing_moves(self):
         possible_mask = self.possible()
@@ -223,37 +459,3 @@ class BoardMinimax:
                 possible_mask = forced_moves       # enforce to play the single forced move
 
         return possible_mask & ~(opponent_win >> 1)  # avoid playing below an opponent winning spot
-
-
-class MiniMax(Bot):
-    """
-    This class is responsible for the Minimax algorithm.
-    At each depth, the algorithm will simulate up to 7 boards, each having a piece that has been dropped in a free column. So with depth 1, we will have 7 boards to analyse, with depth 2 : 49 ,...
-    Through a system of reward each board will be attributed a score. The Minimax will then either try to minimise or maximise the rewards depending on the depth (odd or even). Indeed, because we are using multiple
-    depth, the minimax algorithm will simulate in alternance the possible moves of the current player and the ones of the adversary (creating Min nodes and max nodes). The player that needs to decide where to
-    drop a piece on the current board is considered as the maximising player, hence trying to maximise the reward when a max nodes is encountered. The algorithm will also consider that the adversary plays as good as possible (with
-    the information available with the depth chosen) and hence try to minimise the reward when possible (minimizing player).
-    So after creating all the boards of the tree, at each depth, a board will be selected based on the reward and on the type of nodes (min or max node) starting from the bottom of the tree.
-    The final choice is made based on the 7 boards possible with the score updated through the reward procedure describe above.
-    Note that the larger the depth, the slower the execution.
-    In order to avoid unnecessary exploration of boards, an alpha beta pruning has 
-        print(self._game._turn, self._game._round)been implemented.
-    """
-
-    def __init__(self, game, depth, pruning=True):
-        super().__init__(game, bot_type=MINIMAX, depth=depth, pruning=pruning)
-
-    def minimax(self, board, depth, alpha, beta, maximizingPlayer, pruning):
-        """
-        Main function of minimax, called whenever a move is needed.
-        Recursive function, depth of the recursion being determined by the parameter depth.
-        :param depth: number of iterations the Minimax algorith will run for
-            (the larger the depth the longer the algorithm takes)
-        :alpha: used for the pruning, correspond to the lowest value of the range values of the node
-        :beta: used for the pruning, correspond to the hihest value of the range values of the node
-        :maximizingPlayer: boolean to specify if the algorithm should maximize or minimize the reward
-        :pruning: boolean to specify if the algorithm uses the pruning
-        :return: column where to place the piece
-        """
-        board = BoardMinimax(self._game._board, -self._game._turn, self._game._round)
-        return solve(board, depth)
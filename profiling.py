@@ -0,0 +1,136 @@
+import atexit
+import functools
+import os
+import sys
+import time
+
+# Set to 1 to print a summary at exit, or to a path to also write folded stacks for flamegraph.pl
+ENV_VAR = "C4_PROFILE"
+
+# (module, attribute path) of the functions timed when profiling is enabled
+HOT_PATHS = [
+    ("bot", "Bot.make_move"),
+    ("bot", "Bot.get_winning_move"),
+    ("bot", "Bot.get_defensive_move"),
+    ("connect4game", "Connect4Game.check_win"),
+    ("viewer", "Connect4Viewer.draw_board"),
+    ("minimax", "BoardMinimax.__init__"),
+    ("minimax", "solve"),
+    ("minimax", "negamax"),
+    ("mcts", "MCTSTree.search"),
+]
+
+
+class Profiler:
+    """
+    Counts calls and measures the time spent in wrapped functions.
+    Total time is only counted for the outermost call of a recursive function, self time excludes
+    the time spent in other wrapped functions. Stacks are kept with recursive frames folded together.
+    """
+
+    def __init__(self):
+        self.stats = {}  # label -> [calls, total time, self time]
+        self.folded = {}  # stack path -> self time
+        self._stack = []  # [label, path, start, time spent in children]
+        self._active = {}  # label -> number of frames of label on the stack
+
+    def wrap(self, owner, name, label):
+        """
+        Replaces owner.name with a timed version of it.
+
+        :param owner: module or class holding the function
+        :param name: attribute name of the function
+        :param label: name shown in the reports
+        """
+        func = getattr(owner, name)
+        stats = self.stats.setdefault(label, [0, 0.0, 0.0])
+        stack = self._stack
+        active = self._active
+        folded = self.folded
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if stack:
+                parent = stack[-1]
+                path = parent[1] if parent[0] == label else parent[1] + ";" + label
+            else:
+                path = label
+            frame = [label, path, time.perf_counter(), 0.0]
+            stack.append(frame)
+            active[label] = active.get(label, 0) + 1
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - frame[2]
+                stack.pop()
+                active[label] -= 1
+                stats[0] += 1
+                if not active[label]:
+                    stats[1] += elapsed
+                stats[2] += elapsed - frame[3]
+                folded[path] = folded.get(path, 0.0) + elapsed - frame[3]
+                if stack:
+                    stack[-1][3] += elapsed
+
+        setattr(owner, name, wrapper)
+
+    def report(self, file=sys.stderr):
+        """
+        Prints calls, total and self time of every wrapped function, slowest first.
+        """
+        print(f"{'function':<36}{'calls':>12}{'total (s)':>12}{'self (s)':>12}{'per call (us)':>15}", file=file)
+        for label, (calls, total, own) in sorted(self.stats.items(), key=lambda item: -item[1][2]):
+            if calls:
+                print(f"{label:<36}{calls:>12}{total:>12.3f}{own:>12.3f}{1e6 * own / calls:>15.2f}", file=file)
+
+    def write_folded(self, path):
+        """
+        Writes the stacks in the folded format read by flamegraph.pl, weighted in microseconds.
+        """
+        with open(path, "w") as f:
+            for stack, own in sorted(self.folded.items()):
+                f.write(f"{stack} {round(own * 1e6)}\n")
+
+
+PROFILER = None
+
+
+def enable(output=None):
+    """
+    Wraps the hot paths of the modules already imported and reports at exit.
+    Nothing is wrapped unless this is called, so profiling costs nothing when off.
+
+    :param output: optional path of the folded stacks file
+    :return: the Profiler instance
+    """
+    global PROFILER
+    if PROFILER is not None:
+        return PROFILER
+    PROFILER = Profiler()
+    for module_name, attr_path in HOT_PATHS:
+        module = sys.modules.get(module_name)
+        if module is None:
+            continue
+        owner = module
+        *owners, name = attr_path.split(".")
+        for attr in owners:
+            owner = getattr(owner, attr)
+        PROFILER.wrap(owner, name, f"{module_name}.{attr_path}")
+
+    def report():
+        PROFILER.report()
+        if output:
+            PROFILER.write_folded(output)
+
+    atexit.register(report)
+    return PROFILER
+
+
+def enable_from_env():
+    """
+    Enables profiling when the C4_PROFILE environment variable is set.
+    """
+    value = os.environ.get(ENV_VAR)
+    if value:
+        return enable(None if value == "1" else value)
+    return None
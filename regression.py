@@ -0,0 +1,193 @@
+import argparse
+import collections
+import sys
+import time
+import minimax as mm
+from common import ROW_COUNT, COLUMN_COUNT
+
+CORPUS = "regression.corpus"
+# Iterations of the calibration loop, timed when recording and before checking to scale the budgets
+CALIBRATION_LOOPS = 1000000
+
+CorpusEntry = collections.namedtuple("CorpusEntry", ["moves", "score", "best_moves", "nodes", "time_ms"])
+
+
+def load_corpus(path=CORPUS):
+    """
+    Reads a corpus file. Each line holds the moves (columns numbered from 1, like the Test_* files),
+    the score, the optimal columns separated by commas, the node count and the time budget in ms.
+    Lines starting with # are comments, except "# calibration <ms>" which holds the time of
+    calibrate() on the machine that recorded the corpus.
+
+    :param path: corpus file
+    :return: list of CorpusEntry
+    """
+    entries = []
+    with open(path, "r") as f:
+        for line in f:
+            if not line.strip() or line.startswith("#"):
+                continue
+            moves, score, best_moves, nodes, time_ms = line.split()
+            entries.append(
+                CorpusEntry(moves, int(score), {int(c) for c in best_moves.split(",")}, int(nodes), float(time_ms))
+            )
+    return entries
+
+
+def read_calibration(path=CORPUS):
+    """
+    :param path: corpus file
+    :return: the time of calibrate() in ms when the corpus was recorded, or None
+    """
+    with open(path, "r") as f:
+        for line in f:
+            if line.startswith("# calibration "):
+                return float(line.split()[2])
+    return None
+
+
+def calibrate(runs=5):
+    """
+    Times a fixed integer loop to compare the speed of two machines. It does not use the solver, a
+    slower solver must not scale its own budgets up.
+
+    :param runs: number of runs, the fastest one counts
+    :return: time of the loop in ms
+    """
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        x = 0
+        for i in range(CALIBRATION_LOOPS):
+            x = (x * 31 + i) & 0xFFFFFFFF
+        elapsed = 1000 * (time.perf_counter() - start)
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def optimal_columns(board, score):
+    """
+    :param board: position to analyse
+    :param score: score of the position
+    :return: set of the columns (numbered from 1) reaching that score
+    """
+    columns = set()
+    mm.TRANSPOSITION_TABLE.clear()
+    for col in range(COLUMN_COUNT):
+        if not board.can_play(col):
+            continue
+        if board.winning_move(col):
+            col_score = (ROW_COUNT * COLUMN_COUNT + 1 - board.rounds) // 2
+        else:
+            child = board.copy()
+            child.play(col)
+            # A null-window search is enough to tell whether the child scores at most -score
+            col_score = score if mm.negamax(child, 10000, -score, -score + 1)[1] <= -score else None
+        if col_score == score:
+            columns.add(col + 1)
+    return columns
+
+
+def record(positions, path=CORPUS, budget_margin=0.5):
+    """
+    Solves positions and writes them to a corpus file with their current cost.
+
+    :param positions: list of (moves, expected score) with the moves numbered from 1, like the Test_* files
+    :param path: output corpus file
+    :param budget_margin: time budget written as measured time * (1 + budget_margin)
+    """
+    with open(path, "w") as f:
+        f.write("# moves score best_moves nodes time_budget_ms\n")
+        f.write(f"# calibration {calibrate():.2f}\n")
+        for moves, expected in positions:
+            board = mm.BoardMinimax.from_moves(moves)
+            _, score, nodes, elapsed = mm.solve_fresh(board)
+            if score != expected:
+                raise ValueError(f"{moves}: solver gives {score} instead of {expected}, not recording it")
+            best_moves = ",".join(str(c) for c in sorted(optimal_columns(board, score)))
+            f.write(f"{moves} {score} {best_moves} {nodes} {elapsed * (1 + budget_margin):.2f}\n")
+
+
+def run(entries, node_tolerance=0.1, time_tolerance=0.5, time_slack_ms=5.0, time_scale=1.0):
+    """
+    Solves every corpus position and compares it with the recorded values.
+    Short positions are mostly timer noise, so their time is only checked past time_slack_ms, but
+    the total time of the corpus must stay under the sum of the budgets.
+
+    :param entries: list of CorpusEntry
+    :param node_tolerance: allowed fraction of nodes above the recorded count
+    :param time_tolerance: allowed fraction of time above the budget
+    :param time_slack_ms: time overruns of a single position smaller than this are ignored
+    :param time_scale: factor applied to every time budget, how much slower this machine is than the
+        one that recorded the corpus. Node counts do not depend on the machine and are not scaled
+    :return: list of failure messages
+    """
+    failures = []
+    total = budget = 0.0
+    for entry in entries:
+        entry = entry._replace(time_ms=entry.time_ms * time_scale)
+        col, score, nodes, elapsed = mm.solve_fresh(mm.BoardMinimax.from_moves(entry.moves))
+        if elapsed > entry.time_ms:
+            # Timed again before counting it, a single run is easily slowed down by the machine
+            elapsed = min(elapsed, mm.solve_fresh(mm.BoardMinimax.from_moves(entry.moves))[3])
+        total += elapsed
+        budget += entry.time_ms
+        if score != entry.score:
+            failures.append(f"{entry.moves}: score {score}, expected {entry.score}")
+        elif col + 1 not in entry.best_moves:
+            failures.append(f"{entry.moves}: column {col + 1} is not one of {sorted(entry.best_moves)}")
+        if nodes > entry.nodes * (1 + node_tolerance):
+            failures.append(f"{entry.moves}: {nodes} nodes, budget {entry.nodes}")
+        if elapsed > entry.time_ms * (1 + time_tolerance) and elapsed - entry.time_ms > time_slack_ms:
+            failures.append(f"{entry.moves}: {elapsed:.1f} ms, budget {entry.time_ms:.1f} ms")
+    # The budgets already include the margin added when recording, a slowdown of that much fails
+    if total > budget:
+        failures.append(f"total: {total:.1f} ms, budget {budget:.1f} ms")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the solver against the regression corpus")
+    parser.add_argument("--corpus", default=CORPUS)
+    parser.add_argument("--node-tolerance", type=float, default=0.1, help="Allowed fraction over the node count")
+    parser.add_argument("--time-tolerance", type=float, default=0.5, help="Allowed fraction over the time budget")
+    parser.add_argument(
+        "--time-scale",
+        type=float,
+        default=None,
+        help="Factor applied to the time budgets, by default measured with the calibration loop",
+    )
+    parser.add_argument(
+        "--record",
+        nargs="+",
+        metavar="TEST_FILE:COUNT",
+        help="Rewrite the corpus from the first COUNT positions of each Test_* file instead of checking it",
+    )
+    args = parser.parse_args()
+
+    if args.record:
+        positions = []
+        for spec in args.record:
+            path, _, count = spec.partition(":")
+            with open(path, "r") as f:
+                lines = [line.split() for line in f if line.strip()]
+            positions.extend((moves, int(score)) for moves, score in (lines[:int(count)] if count else lines))
+        record(positions, args.corpus)
+        print(f"{len(positions)} positions written to {args.corpus}")
+        return
+
+    entries = load_corpus(args.corpus)
+    time_scale = args.time_scale
+    if time_scale is None:
+        recorded = read_calibration(args.corpus)
+        time_scale = calibrate() / recorded if recorded else 1.0
+        print(f"time budgets scaled by {time_scale:.2f}")
+    failures = run(entries, args.node_tolerance, args.time_tolerance, time_scale=time_scale)
+    for failure in failures:
+        print(failure)
+    print(f"{len(entries)} positions, {len(failures)} failures")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import array
+import minimax as mm
+
+
+class ReplayIndex:
+    """
+    Positions of a collection of games, without replaying them from the start.
+    A bitboard checkpoint is kept every `interval` plies, so rebuilding the position at any ply
+    replays at most interval - 1 moves. Every position reached is also indexed by its key.
+    """
+
+    def __init__(self, interval=8):
+        """
+        :param interval: number of plies between two checkpoints
+        """
+        self.interval = interval
+        self._moves = []  # per game: bytes of the columns played
+        self._checkpoints = []  # per game: array of position, mask pairs
+        self._positions = {}  # key -> list of (game, ply)
+
+    def __len__(self):
+        return len(self._moves)
+
+    def add_game(self, moves):
+        """
+        :param moves: columns played, numbered from 0
+        :return: id of the game in the index
+        """
+        game = len(self._moves)
+        checkpoints = array.array("Q")
+        board = mm.BoardMinimax([], 0, 0)
+        for ply, col in enumerate(moves):
+            if ply % self.interval == 0:
+                checkpoints.append(board.position)
+                checkpoints.append(board.mask)
+            self._positions.setdefault(board.key(), []).append((game, ply))
+            board.play(col)
+        if len(moves) % self.interval == 0:
+            checkpoints.append(board.position)
+            checkpoints.append(board.mask)
+        self._positions.setdefault(board.key(), []).append((game, len(moves)))
+        self._moves.append(bytes(moves))
+        self._checkpoints.append(checkpoints)
+        return game
+
+    def add_move_strings(self, move_strings):
+        """
+        :param move_strings: games as strings of columns numbered from 1, like the Test_* files
+        :return: ids of the added games
+        """
+        return [self.add_game(mm.parse_moves(moves)) for moves in move_strings]
+
+    def moves(self, game):
+        """
+        :return: the columns played in the game
+        """
+        return list(self._moves[game])
+
+    def position(self, game, ply):
+        """
+        :param game: id of the game
+        :param ply: number of moves played, from 0 to the length of the game
+        :return: BoardMinimax of the game after ply moves
+        """
+        moves = self._moves[game]
+        if not 0 <= ply <= len(moves):
+            raise IndexError(f"game {game} has no ply {ply}")
+        checkpoint = ply // self.interval
+        board = mm.BoardMinimax([], 0, checkpoint * self.interval)
+        board.position = self._checkpoints[game][2 * checkpoint]
+        board.mask = self._checkpoints[game][2 * checkpoint + 1]
+        for col in moves[checkpoint * self.interval:ply]:
+            board.play(col)
+        return board
+
+    def occurrences(self, board):
+        """
+        :param board: BoardMinimax instance or its key()
+        :return: list of (game, ply) where the position was reached
+        """
+        key = board if isinstance(board, int) else board.key()
+        return list(self._positions.get(key, ()))
+
+    def games_reaching(self, board):
+        """
+        :param board: BoardMinimax instance or its key()
+        :return: sorted ids of the games that reached the position
+        """
+        return sorted({game for game, _ in self.occurrences(board)})
+
+
+def game_moves(game):
+    """
+    Rebuilds the move order of a Connect4Game from its per-player move lists.
+
+    :param game: Connect4Game instance
+    :return: columns played, in order
+    """
+    first = game.moves[game._starter]
+    second = game.moves[-game._starter]
+    moves = []
+    for ply in range(len(first) + len(second)):
+        moves.append(first[ply // 2] if ply % 2 == 0 else second[ply // 2])
+    return moves
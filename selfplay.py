@@ -0,0 +1,233 @@
+import argparse
+import collections
+import mmap
+import multiprocessing
+import os
+import random
+import struct
+import sys
+import minimax as mm
+from bot import Bot, MiniMax
+from common import Event, Observer, MINIMAX, MONTE_CARLO, RANDOM, RANDOM_IMPR
+from connect4game import Connect4Game
+
+MAGIC = b"C4SP"
+VERSION = 1
+FILE_HEADER = struct.Struct("<4sB3x")
+# number of moves, result for the first player, flags
+RECORD_HEADER = struct.Struct("<BbB")
+HAS_SCORES = 1
+PLAYER1_STARTED = 2
+
+GameRecord = collections.namedtuple("GameRecord", ["moves", "result", "player1_started", "scores"])
+GameRecord.__doc__ = """
+A self-play game.
+moves: columns played, in order
+result: 1 if the first player to move won, -1 if the second one did, 0 for a draw
+player1_started: whether the first configuration made the first move
+scores: solver score of the position before each move for the player to move, or None
+"""
+
+
+def encode(record):
+    """
+    Packs a game as its header, the moves on 3 bits each and optionally one signed byte per score.
+
+    :param record: GameRecord instance
+    :return: the record as bytes
+    """
+    flags = (HAS_SCORES if record.scores is not None else 0) | (PLAYER1_STARTED if record.player1_started else 0)
+    packed = 0
+    for ply, col in enumerate(record.moves):
+        packed |= col << 3 * ply
+    data = RECORD_HEADER.pack(len(record.moves), record.result, flags)
+    data += packed.to_bytes((3 * len(record.moves) + 7) // 8, "little")
+    if record.scores is not None:
+        data += struct.pack(f"<{len(record.scores)}b", *record.scores)
+    return data
+
+
+def decode(buffer, offset):
+    """
+    :param buffer: bytes-like object holding records
+    :param offset: position of a record in buffer
+    :return: (GameRecord, offset of the next record)
+    """
+    count, result, flags = RECORD_HEADER.unpack_from(buffer, offset)
+    offset += RECORD_HEADER.size
+    size = (3 * count + 7) // 8
+    packed = int.from_bytes(buffer[offset:offset + size], "little")
+    offset += size
+    moves = [(packed >> 3 * ply) & 7 for ply in range(count)]
+    scores = None
+    if flags & HAS_SCORES:
+        scores = list(struct.unpack_from(f"<{count}b", buffer, offset))
+        offset += count
+    return GameRecord(moves, result, bool(flags & PLAYER1_STARTED), scores), offset
+
+
+class GameRecords:
+    """
+    Iterates over the games of a file written by write_games() through a memory map,
+    records are decoded one at a time so the file is never loaded as a whole.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = FILE_HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a self-play record file")
+
+    def __iter__(self):
+        offset = FILE_HEADER.size
+        end = len(self._mmap)
+        while offset < end:
+            record, offset = decode(self._mmap, offset)
+            yield record
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MoveRecorder(Observer):
+    """
+    Keeps the columns played in a game, in order.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.moves = []
+
+    def update(self, obj, event, *argv):
+        if event == Event.PIECE_PLACED:
+            self.moves.append(argv[0][0])
+        elif event == Event.GAME_RESET:
+            self.moves = []
+
+
+def parse_config(config):
+    """
+    :param config: bot type, optionally followed by ":<depth>" for MINIMAX or ":<iterations>" for MONTE_CARLO,
+        MINIMAX also takes ":<depth>:<workers>" to search each move with several processes (Lazy SMP)
+    :return: (bot type, parameter or None, workers)
+    """
+    bot_type, _, param = config.partition(":")
+    param, _, workers = param.partition(":")
+    bot_type = bot_type.upper()
+    if bot_type not in (MINIMAX, MONTE_CARLO, RANDOM, RANDOM_IMPR):
+        raise ValueError(f"unknown bot type {bot_type}")
+    if workers and bot_type != MINIMAX:
+        raise ValueError(f"{bot_type} does not take a number of workers")
+    return bot_type, (int(param) if param else None), (int(workers) if workers else 1)
+
+
+def make_bot(game, config):
+    bot_type, param, workers = parse_config(config)
+    if bot_type == MINIMAX:
+        return MiniMax(game, depth=param or 8, workers=workers)
+    if bot_type == MONTE_CARLO:
+        return Bot(game, bot_type=MONTE_CARLO, iteration=param or 500)
+    return Bot(game, bot_type=bot_type)
+
+
+def score_game(moves, depth):
+    """
+    Replays a game and solves the position before each move.
+
+    :param moves: columns played
+    :param depth: depth given to solve, or None to skip scoring
+    :return: (result for the first player to move, scores or None)
+    """
+    board = mm.BoardMinimax([], 0, 0)
+    scores = [] if depth else None
+    result = 0
+    mm.TRANSPOSITION_TABLE.clear()
+    for ply, col in enumerate(moves):
+        if depth:
+            scores.append(mm.solve_next(board, depth)[1])
+        if board.winning_move(col):
+            result = 1 if ply % 2 == 0 else -1
+            break
+        board.play(col)
+    return result, scores
+
+
+def play_game(task):
+    """
+    Plays one game between two configurations, run in the worker processes.
+
+    :param task: (seed, config of player 1, config of player 2, score depth)
+    :return: the encoded GameRecord
+    """
+    seed, config1, config2, score_depth = task
+    random.seed(seed)
+    game = Connect4Game(None, None)
+    game._player1 = make_bot(game, config1)
+    game._player2 = make_bot(game, config2)
+    recorder = MoveRecorder()
+    game.add_observer(recorder, events=(Event.PIECE_PLACED, Event.GAME_RESET))
+    starter = game.get_turn()
+    try:
+        while game.get_win() is None and game.get_valid_locations():
+            game.bot_place()
+    finally:
+        for player in (game._player1, game._player2):
+            if isinstance(player, MiniMax):
+                player.close()
+    result, scores = score_game(recorder.moves, score_depth)
+    return encode(GameRecord(recorder.moves, result, starter == 1, scores))
+
+
+def write_games(path, games, config1, config2, workers=None, score_depth=None, seed=0):
+    """
+    Plays games on a process pool and streams their records to path as they finish.
+
+    :param path: output file
+    :param games: number of games
+    :param config1: configuration of player 1, see parse_config()
+    :param config2: configuration of player 2
+    :param workers: number of processes, defaults to the number of cores, 1 plays the games in this process
+        (needed by MINIMAX configurations with several workers, pool processes cannot start their own)
+    :param score_depth: depth used to score every position, None to skip scoring
+    :param seed: seed of the first game, game i uses seed + i
+    """
+    parallel_bot = parse_config(config1)[2] > 1 or parse_config(config2)[2] > 1
+    if parallel_bot and workers != 1:
+        raise ValueError("bots searching with several processes cannot run in the pool, use workers=1")
+    tasks = ((seed + i, config1, config2, score_depth) for i in range(games))
+    with open(path, "wb") as f:
+        f.write(FILE_HEADER.pack(MAGIC, VERSION))
+        if workers == 1:
+            for task in tasks:
+                f.write(play_game(task))
+            return
+        with multiprocessing.Pool(workers) as pool:
+            for data in pool.imap_unordered(play_game, tasks, chunksize=16):
+                f.write(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate self-play games between two bots")
+    parser.add_argument("--player1", "-1", default="MINIMAX:8", help="e.g. MINIMAX:8, MINIMAX:8:4, MONTE_CARLO:500, RANDOM_IMPR")
+    parser.add_argument("--player2", "-2", default="MONTE_CARLO:500")
+    parser.add_argument("--games", "-n", type=int, default=100)
+    parser.add_argument("--workers", "-j", type=int, default=os.cpu_count())
+    parser.add_argument("--score-depth", type=int, default=None, help="Score every position with solve at this depth")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", "-o", default="selfplay.c4sp")
+    args = parser.parse_args()
+    write_games(args.output, args.games, args.player1, args.player2, args.workers, args.score_depth, args.seed)
+    print(f"{args.games} games written to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
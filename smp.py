@@ -0,0 +1,205 @@
+import multiprocessing
+from multiprocessing import shared_memory
+import queue
+import time
+import minimax as mm
+from common import ROW_COUNT, COLUMN_COUNT, Progress
+
+# Seconds between two checks of the cancel token and of the searchers still running
+POLL_INTERVAL = 0.05
+
+# Move orders of the searchers, the first one is the usual center-first order
+SEARCH_ORDERS = [
+    [3, 2, 4, 1, 5, 0, 6],
+    [3, 4, 2, 5, 1, 6, 0],
+    [2, 3, 4, 1, 5, 0, 6],
+    [4, 3, 2, 5, 1, 6, 0],
+    [3, 2, 4, 5, 1, 0, 6],
+    [3, 4, 2, 1, 5, 6, 0],
+    [2, 4, 3, 1, 5, 0, 6],
+    [4, 2, 3, 5, 1, 6, 0],
+]
+
+
+class SharedTranspositionTable(mm.TranspositionTable):
+    """
+    Fixed-size transposition table in a shared memory buffer, usable from several processes at once.
+    Each slot is one 64-bit word holding the key (49 bits) above the packed entry (10 bits), so a slot
+    is written in a single store and readers never see half of an entry. Colliding positions overwrite
+    each other, no lock is needed.
+    """
+
+    def __init__(self, size=4194301, name=None):
+        """
+        :param size: number of slots, a prime spreads the keys best
+        :param name: name of an existing table to attach to, a new one is created if None
+        """
+        self.size = size
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=8 * size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.slots = self.shm.buf.cast("Q")
+
+    def __getstate__(self):
+        # Processes that are not forked attach to the same buffer by name
+        return self.size, self.shm.name
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def store(self, key, score, bound, move):
+        self.slots[key % self.size] = key << 10 | self.pack(score, bound, move)
+
+    def lookup(self, key):
+        slot = self.slots[key % self.size]
+        if slot >> 10 != key or not slot:
+            return None
+        return self.unpack(slot & 1023)
+
+    def clear(self):
+        self.shm.buf[:] = bytes(len(self.shm.buf))
+
+    def close(self):
+        self.slots.release()
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+def _search(index, table, order, position, mask, rounds, depth, guess, results, report):
+    """
+    Body of a searcher process: solves the root with its own move order and the shared table.
+    Progress reports and the result are sent to the results queue, tagged with the searcher index,
+    an exception is sent as an error message so the caller does not wait for a result forever.
+    """
+    try:
+        mm.TRANSPOSITION_TABLE = table
+        mm.COLUMN_ORDER = order
+        board = mm.BoardMinimax([], 0, rounds)
+        board.position = position
+        board.mask = mask
+        progress = (lambda p: results.put(("progress", index, p))) if report else None
+        results.put(("result", index, mm.solve(board, depth, guess=guess, progress=progress)))
+    except Exception as exc:
+        results.put(("error", index, repr(exc)))
+
+
+def _combine(board, reports, start, done):
+    """
+    Merges the latest report of each searcher: they all search the same root, so the bounds they
+    proved hold together.
+    """
+    lower = -(ROW_COUNT * COLUMN_COUNT - board.rounds) // 2
+    upper = (ROW_COUNT * COLUMN_COUNT + 1 - board.rounds) // 2
+    best_move = next((col for col in mm.COLUMN_ORDER if board.can_play(col)), None)
+    nodes = 0
+    for report in reports.values():
+        if report.lower > lower:
+            lower = report.lower
+            best_move = report.best_move
+        upper = min(upper, report.upper)
+        nodes += report.nodes
+    elapsed = time.perf_counter() - start
+    return Progress(lower, upper, best_move, nodes, elapsed, nodes / elapsed if elapsed > 0 else 0.0, None, done)
+
+
+def solve_parallel(board, depth, workers=None, guess=None, table=None, progress=None, cancel=None):
+    """
+    Lazy SMP: several processes solve the same position with different move orders while sharing
+    one transposition table, so each benefits from the cutoffs found by the others.
+    The first result is returned and the other searchers are stopped.
+
+    :param board: BoardMinimax instance
+    :param depth: maximum depth of the search
+    :param workers: number of searchers, defaults to the number of cores
+    :param guess: predicted score passed to solve
+    :param table: SharedTranspositionTable to reuse between calls, a temporary one is used if None
+    :param progress: optional callable receiving a common.Progress merging the reports of all the
+        searchers (best bounds, summed nodes), as solve does
+    :param cancel: optional common.CancelToken, checked every POLL_INTERVAL seconds, once cancelled the
+        searchers are stopped and the best column and lower bound proven so far are returned
+    :return: (best column, score)
+    :raises RuntimeError: if every searcher failed or exited without a result
+    """
+    workers = workers or multiprocessing.cpu_count()
+    own_table = table is None
+    report = progress is not None or cancel is not None
+    searchers = []
+    try:
+        if own_table:
+            table = SharedTranspositionTable()
+        results = multiprocessing.Queue()
+        start = time.perf_counter()
+        for i in range(workers):
+            searcher = multiprocessing.Process(
+                target=_search,
+                args=(
+                    i,
+                    table,
+                    SEARCH_ORDERS[i % len(SEARCH_ORDERS)],
+                    board.position,
+                    board.mask,
+                    board.rounds,
+                    depth,
+                    guess,
+                    results,
+                    report,
+                ),
+                daemon=True,
+            )
+            searcher.start()
+            searchers.append(searcher)
+        reports = {}
+        errors = {}
+        while True:
+            try:
+                kind, index, message = results.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                kind = None
+                if not any(searcher.is_alive() for searcher in searchers):
+                    # A searcher may have posted its result just before exiting
+                    try:
+                        kind, index, message = results.get(timeout=POLL_INTERVAL)
+                    except queue.Empty:
+                        raise RuntimeError(f"every searcher stopped without a result: {_failures(searchers, errors)}")
+            if kind == "error":
+                errors[index] = message
+                if len(errors) == len(searchers):
+                    raise RuntimeError(f"every searcher failed: {_failures(searchers, errors)}")
+            if kind == "result":
+                # The searcher sent its last report just before its result
+                if progress is not None:
+                    progress(_combine(board, reports, start, True))
+                return message
+            if kind == "progress":
+                reports[index] = message
+            if cancel is not None and cancel.cancelled:
+                final = _combine(board, reports, start, True)
+                if progress is not None:
+                    progress(final)
+                return final.best_move, final.lower
+            if kind == "progress" and progress is not None:
+                progress(_combine(board, reports, start, False))
+    finally:
+        for searcher in searchers:
+            searcher.terminate()
+        for searcher in searchers:
+            searcher.join()
+        if own_table and table is not None:
+            release(table)
+
+
+def _failures(searchers, errors):
+    return "; ".join(
+        errors.get(index, f"exit code {searcher.exitcode}") for index, searcher in enumerate(searchers)
+    )
+
+
+def release(table):
+    """
+    Closes a SharedTranspositionTable and frees its shared memory segment.
+    """
+    table.close()
+    table.unlink()